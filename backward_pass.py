@@ -0,0 +1,297 @@
+import numpy as np
+from numpy import linalg as LA
+
+'''
+Backward passes of iLQR for the LQR subproblem about a nominal trajectory:
+    dx[i+1] = fx[i]*dx[i] + fu[i]*du[i] + d[i]
+    l[i] = lx[i]'*dx + lu[i]'*du + 1/2*dx'*lxx[i]*dx + 1/2*du'*luu[i]*du
+           + du'*lux[i]*dx
+    V[N] = Vx_N'*dx + 1/2*dx'*Vxx_N*dx
+All derivative arguments are stacked over the horizon: fx (N, n, n),
+fu (N, n, m), lx (N, n), lu (N, m), lxx (N, n, n), luu (N, m, m) and
+lux (N, m, n) (None for zeros). lxx, luu and Vxx_N can also be given as
+their diagonals, (N, n), (N, m) and (n,) (see costs.py). d (N, n) are the defects
+x[i+1] - F(x[i], u[i]) of a multiple-shooting trajectory (None for zeros,
+i.e. a trajectory obtained by a single rollout).
+Both passes return k (N, m), K (N, m, n), Vx (N+1, n), Vxx (N+1, n, n) and
+delta_V (N+1,), with du = k + K*dx.
+'''
+
+
+'''
+Preallocated outputs of CalcBackwardPass for horizon N, so that all
+iterations of a solve write into the same arrays instead of allocating
+new ones. If not is_value_function_stored, Vx and Vxx only have two rows,
+used alternately for steps i+1 and i, which is all the recursion needs;
+after a pass, Vx[0] and Vxx[0] are the value function at step 0.
+'''
+class BackwardPassWorkspace:
+    def __init__(self, N, n, m, is_value_function_stored=True):
+        num_value_rows = N+1 if is_value_function_stored else 2
+        self.k = np.zeros((N, m))
+        self.K = np.zeros((N, m, n))
+        self.Vx = np.zeros((num_value_rows, n))
+        self.Vxx = np.zeros((num_value_rows, n, n))
+        self.delta_V = np.zeros(N+1)
+
+
+'''
+Returns H + lzz, where lzz has the shape of H, or is the diagonal of such
+a matrix (one dimension less). H is modified in place.
+'''
+def AddHessian(H, lzz):
+    if lzz.ndim == H.ndim - 1:
+        idx = np.arange(H.shape[-1])
+        H[..., idx, idx] += lzz
+    else:
+        H += lzz
+    return H
+
+
+# lzz (n, n), or its diagonal (n,), as a full matrix.
+def AsMatrix(lzz):
+    return np.diag(lzz) if lzz.ndim == 1 else lzz
+
+
+# symmetric A with its eigenvalues clipped to at least min_eigenvalue.
+def ClipEigenvalues(A, min_eigenvalue):
+    w, V = LA.eigh(A)
+    if w[0] >= min_eigenvalue:
+        return A
+    return (V*np.maximum(w, min_eigenvalue)).dot(V.T)
+
+
+'''
+CalcCurvature(i, Vx_next): optional second-order dynamics terms of DDP,
+    returning (Vx'*fxx, Vx'*fuu, Vx'*fux) at step i, added to Qxx, Quu, Qux.
+    Only the serial pass supports them, as they depend on Vx[i+1]. As they
+    can make Quu and Vxx indefinite, the eigenvalues of Quu are then
+    clipped to at least the smallest one of luu[i] (the Gauss-Newton Quu
+    is never less curved than luu), and those of Vxx to at least 0.
+regularization: mu added to the diagonal of Quu (Levenberg-Marquardt).
+value_regularization: mu added to the diagonal of Vxx[i+1] where it enters
+    Quu and Qux (the state-space regularization of "Synthesis and
+    stabilization of complex behaviors through online trajectory
+    optimization" by Y. Tassa et al.), which keeps the new trajectory
+    close to the old one.
+fu_rows: rows of fu that can be nonzero (a slice or index array, see
+    sparsity.JacobianStructure.CalcDiscretePattern); the products with fu
+    are restricted to them.
+workspace: optional BackwardPassWorkspace whose arrays are filled and
+    returned.
+'''
+def CalcBackwardPass(fx, fu, lx, lu, lxx, luu, lux, Vx_N, Vxx_N, d=None,
+                     CalcCurvature=None, regularization=0., value_regularization=0.,
+                     fu_rows=None, workspace=None):
+    N, n, m = fu.shape[0], fu.shape[1], fu.shape[2]
+    if workspace is None:
+        workspace = BackwardPassWorkspace(N, n, m)
+    k, K, Vx, Vxx, delta_V = workspace.k, workspace.K, workspace.Vx, \
+        workspace.Vxx, workspace.delta_V
+    # step i is stored in row i % num_value_rows, i.e. in row i if the
+    # whole value function is stored.
+    num_value_rows = Vx.shape[0]
+    Vx[N % num_value_rows] = Vx_N
+    Vxx[N % num_value_rows] = AsMatrix(Vxx_N)
+
+    for i in range(N-1, -1, -1): # i = N-1, ....
+        r = i % num_value_rows
+        r_next = (i+1) % num_value_rows
+        if d is None:
+            Vx_next = Vx[r_next]
+        else:
+            Vx_next = Vx[r_next] + Vxx[r_next].dot(d[i])
+        Qx = lx[i] + fx[i].T.dot(Vx_next)
+        Qxx = AddHessian(fx[i].T.dot(Vxx[r_next].dot(fx[i])), lxx[i])
+        Vxx_u = Vxx[r_next] # Vxx[i+1] in Quu and Qux.
+        if value_regularization > 0:
+            Vxx_u = Vxx_u + value_regularization*np.eye(n)
+        if fu_rows is None:
+            Qu = lu[i] + fu[i].T.dot(Vx_next)
+            Quu = AddHessian(fu[i].T.dot(Vxx_u.dot(fu[i])), luu[i])
+            Qux = fu[i].T.dot(Vxx_u.dot(fx[i]))
+        else:
+            fu_r = fu[i][fu_rows]
+            Vxx_r = Vxx_u[fu_rows]
+            Qu = lu[i] + fu_r.T.dot(Vx_next[fu_rows])
+            Quu = AddHessian(fu_r.T.dot(Vxx_r[:, fu_rows].dot(fu_r)), luu[i])
+            Qux = fu_r.T.dot(Vxx_r.dot(fx[i]))
+        if not(lux is None):
+            Qux += lux[i]
+        if regularization > 0:
+            Quu = Quu + regularization*np.eye(m)
+        if not(CalcCurvature is None):
+            Cxx, Cuu, Cux = CalcCurvature(i, Vx_next)
+            Qxx = Qxx + Cxx
+            Quu = ClipEigenvalues(Quu + Cuu, luu[i].min() if luu[i].ndim == 1
+                                  else LA.eigvalsh(luu[i])[0])
+            Qux = Qux + Cux
+
+        # compute k and K
+        k[i] = -LA.solve(Quu, Qu) # Quu_inv.dot(Qu)
+        K[i] = -LA.solve(Quu, Qux) # Quu_inv.dot(Qux)
+
+        # update derivatives of V
+        delta_V[i] = 0.5*k[i].dot(Quu.dot(k[i])) + Qu.dot(k[i])
+        Vx[r] = Qx + K[i].T.dot(Quu.dot(k[i])) + K[i].T.dot(Qu) + Qux.T.dot(k[i])
+        Vxx[r] = Qxx + K[i].T.dot(Quu.dot(K[i])) + K[i].T.dot(Qux) + Qux.T.dot(K[i])
+        # round-off makes Vxx asymmetric, and the asymmetry grows
+        # exponentially over long horizons if it is not removed.
+        Vxx[r] = 0.5*(Vxx[r] + Vxx[r].T)
+        if not(CalcCurvature is None):
+            Vxx[r] = ClipEigenvalues(Vxx[r], 0.)
+
+    return k, K, Vx, Vxx, delta_V
+
+
+'''
+Backward pass as a batched associative scan, following the associative
+formulation of LQR in "Temporal parallelization of dynamic programming and linear
+quadratic control" by S. Sarkka and A. F. Garcia-Fernandez.
+
+After eliminating lu and lux with du = v - luu^-1*(lu + lux*dx), every
+step i is an element e[i] = (A, b, C, eta, J) of the conditional value
+function from step i to i+1:
+    A = fx - fu*luu^-1*lux,  b = d - fu*luu^-1*lu,  C = fu*luu^-1*fu',
+    J = lxx - lux'*luu^-1*lux,  eta = -(lx - lux'*luu^-1*lu),
+and the terminal element is (0, 0, 0, -Vx_N, Vxx_N). Combining elements
+with CombineElements is associative, and the suffix e[i] x ... x e[N]
+has J = Vxx[i] and eta = -Vx[i].
+
+The suffixes are computed as a blocked scan: the horizon is split into
+num_chunks chunks of equal length L (default about sqrt(N)), and
+1. the suffixes within every chunk are computed for all chunks at once,
+   in L-1 batched steps,
+2. the chunk totals are combined from the end, in num_chunks-1 steps,
+3. every chunk's suffixes are combined with the total of all later chunks,
+   in a single batched step.
+This takes about 2*sqrt(N) sequential NumPy operations instead of N for
+the serial pass. k and K then follow from Vx, Vxx for all steps at once.
+The scan is not parallel across cores: it runs in the calling thread, and
+only replaces the per-step Python loop of the serial pass with batched
+NumPy operations, which pays off for long horizons (see
+benchmark_backward_pass.py).
+fu_rows is accepted for compatibility with CalcBackwardPass; the batched
+products are dense.
+'''
+def CalcBackwardPassScan(fx, fu, lx, lu, lxx, luu, lux, Vx_N, Vxx_N,
+                         d=None, num_chunks=None, fu_rows=None):
+    N, n, m = fu.shape[0], fu.shape[1], fu.shape[2]
+    if num_chunks is None:
+        num_chunks = int(np.ceil(np.sqrt(N+1)))
+    L = int(np.ceil((N+1)/float(num_chunks))) # chunk length
+
+    # elements e[0], ..., e[N], padded with identity elements to
+    # num_chunks*L.
+    A = np.zeros((num_chunks*L, n, n))
+    A[:] = np.eye(n)
+    b = np.zeros((num_chunks*L, n))
+    C = np.zeros((num_chunks*L, n, n))
+    eta = np.zeros((num_chunks*L, n))
+    J = np.zeros((num_chunks*L, n, n))
+    is_luu_diagonal = luu.ndim == 2
+    if is_luu_diagonal:
+        luu_inv_fuT = fu.transpose(0, 2, 1)/luu[:, :, None] # (N, m, n)
+        luu_inv_lu = lu/luu # (N, m)
+    else:
+        luu_inv_fuT = LA.solve(luu, fu.transpose(0, 2, 1))
+        luu_inv_lu = LA.solve(luu, lu[:, :, None])[:, :, 0]
+    A[0:N] = fx
+    b[0:N] = -np.einsum('inm,im->in', fu, luu_inv_lu)
+    if not(d is None):
+        b[0:N] += d
+    C[0:N] = np.matmul(fu, luu_inv_fuT)
+    eta[0:N] = -lx
+    AddHessian(J[0:N], lxx)
+    if not(lux is None):
+        if is_luu_diagonal:
+            luu_inv_lux = lux/luu[:, :, None] # (N, m, n)
+        else:
+            luu_inv_lux = LA.solve(luu, lux)
+        A[0:N] -= np.matmul(fu, luu_inv_lux)
+        J[0:N] -= np.matmul(lux.transpose(0, 2, 1), luu_inv_lux)
+        eta[0:N] += np.einsum('imn,im->in', lux, luu_inv_lu)
+    A[N] = 0.
+    eta[N] = -Vx_N
+    J[N] = AsMatrix(Vxx_N)
+
+    # views of shape (num_chunks, L, ...)
+    elements = tuple(e.reshape((num_chunks, L) + e.shape[1:])
+                     for e in (A, b, C, eta, J))
+
+    # 1. suffixes within chunks.
+    for l in range(L-2, -1, -1):
+        combined = CombineElements(tuple(e[:, l] for e in elements),
+                                   tuple(e[:, l+1] for e in elements))
+        for e, e_combined in zip(elements, combined):
+            e[:, l] = e_combined
+
+    # 2. totals of chunk c and all chunks after it.
+    totals = tuple(e[:, 0].copy() for e in elements)
+    for c in range(num_chunks-2, -1, -1):
+        combined = CombineElements(tuple(e[c] for e in totals),
+                                   tuple(e[c+1] for e in totals))
+        for e, e_combined in zip(totals, combined):
+            e[c] = e_combined
+
+    # 3. prepend chunk suffixes to the totals of later chunks. Only the
+    # value function (eta, J) of the results is needed.
+    if num_chunks > 1:
+        eta_c, J_c = CombineElements(tuple(e[0:-1] for e in elements),
+                                     tuple(e[1:, None] for e in totals),
+                                     is_value_only=True)
+        elements[3][0:-1] = eta_c
+        elements[4][0:-1] = J_c
+
+    Vx = -eta[0:N+1]
+    Vxx = 0.5*(J[0:N+1] + J[0:N+1].transpose(0, 2, 1))
+
+    # policy from V[i+1], for all i at once.
+    fuT = fu.transpose(0, 2, 1)
+    Vxx_next_fu = np.matmul(Vxx[1:], fu)
+    Vx_next = Vx[1:]
+    if not(d is None):
+        Vx_next = Vx_next + np.einsum('ijk,ik->ij', Vxx[1:], d)
+    Qu = lu + np.einsum('inm,in->im', fu, Vx_next)
+    Quu = AddHessian(np.matmul(fuT, Vxx_next_fu), luu)
+    Qux = np.matmul(Vxx_next_fu.transpose(0, 2, 1), fx)
+    if not(lux is None):
+        Qux += lux
+    k = -LA.solve(Quu, Qu[:, :, None])[:, :, 0]
+    K = -LA.solve(Quu, Qux)
+    delta_V = np.zeros(N+1)
+    delta_V[0:N] = 0.5*np.einsum('im,im->i', k, np.einsum('imj,ij->im', Quu, k)) + \
+        np.einsum('im,im->i', Qu, k)
+
+    return k, K, Vx, Vxx, delta_V
+
+
+'''
+Combines elements e_i (earlier) and e_j (later) into e_i x e_j.
+Each element is a tuple (A, b, C, eta, J) of arrays with any number of
+leading batch dimensions, which are broadcast against each other.
+If is_value_only, only eta and J of the result are computed and returned.
+'''
+def CombineElements(e_i, e_j, is_value_only=False):
+    A_i, b_i, C_i, eta_i, J_i = e_i
+    A_j, b_j, C_j, eta_j, J_j = e_j
+    n = A_i.shape[-1]
+    # (I + C_i*J_j)^-1 and (I + J_j*C_i)^-1 = ((I + C_i*J_j)^-1)' as
+    # C_i and J_j are symmetric.
+    M = LA.inv(np.eye(n) + np.matmul(C_i, J_j))
+    A_iT_MT = np.matmul(A_i.swapaxes(-1, -2), M.swapaxes(-1, -2))
+    eta = np.einsum('...ij,...j->...i', A_iT_MT,
+                    eta_j - np.einsum('...ij,...j->...i', J_j, b_i)) + eta_i
+    J = np.matmul(np.matmul(A_iT_MT, J_j), A_i) + J_i
+    if is_value_only:
+        return eta, J
+
+    A_j_M = np.matmul(A_j, M)
+    A = np.matmul(A_j_M, A_i)
+    b = np.einsum('...ij,...j->...i', A_j_M,
+                  b_i + np.einsum('...ij,...j->...i', C_i, eta_j)) + b_j
+    C = np.matmul(np.matmul(A_j_M, C_i), A_j.swapaxes(-1, -2)) + C_j
+    return A, b, C, eta, J
+
+backward_passes = {'serial': CalcBackwardPass,
+                   'scan': CalcBackwardPassScan}
@@ -0,0 +1,63 @@
+import time
+import numpy as np
+from backward_pass import CalcBackwardPass, CalcBackwardPassScan
+
+'''
+Compares the serial backward pass with the batched associative-scan
+backward pass (both on one core) on random LQR subproblems the size of the
+3D quadrotor (n = 12, m = 4), and reports the horizon length above which
+the scan is faster.
+'''
+
+
+def MakeProblem(N, n, m, rng):
+    h = 0.01
+    fx = np.eye(n) + h*rng.randn(N, n, n)
+    fu = h*rng.randn(N, n, m)
+    lx = rng.randn(N, n)
+    lu = rng.randn(N, m)
+    lxx = np.zeros((N, n, n))
+    lxx[:] = np.eye(n)
+    luu = np.zeros((N, m, m))
+    luu[:] = np.eye(m)
+    Vx_N = rng.randn(n)
+    Vxx_N = 100*np.eye(n)
+    return fx, fu, lx, lu, lxx, luu, None, Vx_N, Vxx_N
+
+
+def TimeBackwardPass(BackwardPass, problem, repeats):
+    times = np.zeros(repeats)
+    for r in range(repeats):
+        t_start = time.perf_counter()
+        BackwardPass(*problem)
+        times[r] = time.perf_counter() - t_start
+    return np.median(times)
+
+
+if __name__ == '__main__':
+    n = 12
+    m = 4
+    rng = np.random.RandomState(0)
+    horizons = [10, 25, 50, 100, 200, 500, 1000, 2000, 4000]
+    crossover = None
+
+    print("%6s %12s %12s %8s %8s" % ("N", "serial(ms)", "scan(ms)", "speedup", "max_err"))
+    for N in horizons:
+        problem = MakeProblem(N, n, m, rng)
+        repeats = max(3, int(2000/N))
+        t_serial = TimeBackwardPass(CalcBackwardPass, problem, repeats)
+        t_scan = TimeBackwardPass(CalcBackwardPassScan, problem, repeats)
+
+        k1, K1, Vx1, Vxx1, dV1 = CalcBackwardPass(*problem)
+        k2, K2, Vx2, Vxx2, dV2 = CalcBackwardPassScan(*problem)
+        err = max(np.abs(K1-K2).max()/np.abs(K1).max(),
+                  np.abs(Vxx1-Vxx2).max()/np.abs(Vxx1).max())
+        print("%6d %12.3f %12.3f %8.2f %8.1e" % (N, 1e3*t_serial, 1e3*t_scan,
+                                              t_serial/t_scan, err))
+        if crossover is None and t_scan < t_serial:
+            crossover = N
+
+    if crossover is None:
+        print("serial backward pass was faster for all horizons.")
+    else:
+        print("scan backward pass is faster from N = %d." % crossover)
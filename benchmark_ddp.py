@@ -0,0 +1,54 @@
+import time
+import numpy as np
+from iLQR import DiscreteTimeIterativeLQR, TrajectorySpecs
+from quadrotor3D import CalcF, CalcFBatch, n, m, mass, g
+
+'''
+Compares Gauss-Newton iLQR with full second-order DDP (mode='ddp') on the
+3D quadrotor recovering from large initial roll/pitch. Both solvers get
+the same specs and iteration budget; the number of iterations until the
+relative cost reduction drops below 1%, the final cost and the wall-clock
+time are reported. Both use autodiff Jacobians; the dynamics Hessians of
+DDP are batched through quadrotor3D.CalcFBatch.
+'''
+
+
+def MakeSpecs(rpy0, h=0.01, N=200):
+    x0 = np.zeros(n)
+    x0[3:6] = rpy0
+    u0 = np.zeros(m)
+    u0[:] = mass * g / 4
+    xd = np.zeros(n)
+    xd[0:3] = [1, 1, 0.5]
+    ud = u0
+    QN = 100*np.diag([10,10,10,1,1,1,  0.1,0.1,0.1,0.1,0.1,0.1])
+    Q_vec = np.ones(n)
+    Q_vec[6:12] *= 0.1
+    Q = np.diag(Q_vec)
+    R = np.eye(m)
+    return TrajectorySpecs(x0, u0, xd, ud, h, N, Q, R, QN)
+
+
+def RunSolver(mode, traj_specs, max_iterations):
+    planner = DiscreteTimeIterativeLQR(CalcF, n, m, mode=mode, CalcFBatch=CalcFBatch,
+                                       max_iterations=max_iterations)
+    t_start = time.perf_counter()
+    x, u, J, QN, Vx, Vxx, k, K = planner.CalcTrajectory(
+        traj_specs, is_logging_trajectories=False)
+    return J.size - 1, J[-1], time.perf_counter() - t_start
+
+
+if __name__ == '__main__':
+    max_iterations = 30
+    initial_attitudes = [[0.3, -0.3, 0.],
+                         [0.6, -0.6, 0.5],
+                         [0.7, -0.6, 1.]]
+    results = []
+    for rpy0 in initial_attitudes:
+        traj_specs = MakeSpecs(rpy0)
+        for mode in ('ilqr', 'ddp'):
+            results.append((rpy0, mode) + RunSolver(mode, traj_specs, max_iterations))
+
+    print("%18s %6s %11s %12s %9s" % ("rpy0", "mode", "iterations", "final cost", "time(s)"))
+    for rpy0, mode, iterations, J_final, t in results:
+        print("%18s %6s %11d %12.3f %9.2f" % (np.round(rpy0, 2), mode, iterations, J_final, t))
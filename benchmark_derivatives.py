@@ -0,0 +1,54 @@
+import time
+import numpy as np
+from pydrake.forwarddiff import jacobian
+from discretization import discretizations
+from derivatives import CentralDifference, ComplexStep, MakeCalcFBatch
+from quadrotor3D import CalcF, CalcFBatch, n, m, mass, g
+
+'''
+Accuracy and speed of the derivative providers of derivatives.py against
+pydrake.forwarddiff.jacobian on the 3D quadrotor, for fx, fu at N random
+knots about hover. The relative error is max|f - f_autodiff|/max|f_autodiff|.
+'''
+
+
+def MakeKnots(N, rng):
+    x = 0.3*rng.randn(N, n)
+    u = mass*g/4 + 0.5*rng.randn(N, m)
+    return x, u
+
+
+def CalcJacobiansAutoDiff(discretization, x, u, h):
+    N = u.shape[0]
+    fx = np.zeros((N, n, n))
+    fu = np.zeros((N, n, m))
+    for i in range(N):
+        fx[i], fu[i] = discretization.CalcJacobians(CalcF, jacobian, x[i], u[i], h)
+    return fx, fu
+
+
+if __name__ == '__main__':
+    h = 0.01
+    N = 200
+    rng = np.random.RandomState(0)
+    x, u = MakeKnots(N, rng)
+    providers = [('central_difference', CentralDifference(), CalcFBatch),
+                 ('complex_step', ComplexStep(), CalcFBatch),
+                 ('central_difference (CalcF loop)', CentralDifference(),
+                  MakeCalcFBatch(CalcF))]
+
+    print("%8s %32s %10s %10s" % ("scheme", "provider", "time(ms)", "rel_err"))
+    for name in ('euler', 'rk4'):
+        discretization = discretizations[name]()
+        t_start = time.perf_counter()
+        fx_ad, fu_ad = CalcJacobiansAutoDiff(discretization, x, u, h)
+        t_ad = time.perf_counter() - t_start
+        print("%8s %32s %10.2f %10s" % (name, "autodiff", 1e3*t_ad, "-"))
+        scale = max(np.abs(fx_ad).max(), np.abs(fu_ad).max())
+
+        for provider_name, provider, CalcFBatch_i in providers:
+            t_start = time.perf_counter()
+            fx, fu = provider.CalcJacobians(CalcFBatch_i, discretization, x, u, h)
+            t = time.perf_counter() - t_start
+            err = max(np.abs(fx - fx_ad).max(), np.abs(fu - fu_ad).max())/scale
+            print("%8s %32s %10.2f %10.1e" % (name, provider_name, 1e3*t, err))
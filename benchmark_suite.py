@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from scenarios import scenarios
+
+'''
+Reproducible benchmark of DiscreteTimeIterativeLQR on all scenarios of
+scenarios.py (pendulum, cart-pole, 2D quadrotor, double integrator, 3D
+quadrotor) for several horizons, scaled from each scenario's own N.
+
+For every scenario and horizon, the same problem is solved repeats times:
+    median_solve_time, median_iteration_time: medians over the repeats of
+        the wall time of a solve and of a solve divided by its iterations,
+    iterations: iterations until convergence (or max_iterations),
+    final_cost: J of the last iteration,
+    peak_memory: peak traced allocations (tracemalloc) of one extra solve,
+        which is not timed.
+Results are written to JSON, to --output (default
+results/benchmark_results.json; results/ is ignored by git). With --compare, the timings and peak memory
+are compared with an earlier result file, and the script exits with status
+1 if any of them grew by more than --threshold (relative), e.g.
+    python benchmark_suite.py --output results/base.json
+    (change the solver)
+    python benchmark_suite.py --output results/new.json --compare results/base.json
+'''
+
+compared_metrics = ('median_solve_time', 'median_iteration_time', 'peak_memory')
+
+
+def GetRevision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def RunBenchmark(scenario, N, repeats, max_iterations):
+    traj_specs = scenario.MakeTrajSpecs(N)
+    planner = scenario.MakePlanner(max_iterations=max_iterations)
+    solve_times = np.zeros(repeats)
+    iteration_times = np.zeros(repeats)
+    for r in range(repeats):
+        result = planner.CalcTrajectory(traj_specs, is_logging_trajectories=False,
+                                        is_returning_stats=True)
+        stats = result[-1]
+        solve_times[r] = stats.total_time
+        iteration_times[r] = stats.total_time/max(stats.num_iterations, 1)
+
+    tracemalloc.start()
+    planner.CalcTrajectory(traj_specs, is_logging_trajectories=False)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'scenario': scenario.name,
+            'N': N,
+            'repeats': repeats,
+            'median_solve_time': float(np.median(solve_times)),
+            'median_iteration_time': float(np.median(iteration_times)),
+            'iterations': stats.num_iterations,
+            'final_cost': float(stats.cost_history[-1]),
+            'peak_memory': peak_memory}
+
+
+def RunSuite(names, scales, repeats, max_iterations):
+    results = []
+    for name in names:
+        scenario = scenarios[name]
+        for scale in scales:
+            N = max(int(round(scale*scenario.N)), 1)
+            results.append(RunBenchmark(scenario, N, repeats, max_iterations))
+            PrintResult(results[-1])
+    return {'metadata': {'revision': GetRevision(),
+                         'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                         'python': platform.python_version(),
+                         'numpy': np.__version__,
+                         'machine': platform.machine(),
+                         'max_iterations': max_iterations},
+            'results': results}
+
+
+def PrintResult(result):
+    print("%18s %6d %12.2f %12.3f %6d %14.6g %10.1f" % (
+        result['scenario'], result['N'], 1e3*result['median_solve_time'],
+        1e3*result['median_iteration_time'], result['iterations'],
+        result['final_cost'], result['peak_memory']/1e6))
+
+
+'''
+Compares the results of two suite runs, matched by scenario and N.
+Returns the regressions, (scenario, N, metric, baseline value, current
+value), of the metrics that grew by more than threshold (relative), and
+the matched results whose iterations or final cost (relative 1e-6) changed.
+'''
+def CompareResults(baseline, current, threshold=0.1):
+    baseline_results = {(r['scenario'], r['N']): r for r in baseline['results']}
+    regressions = []
+    changed = []
+    for result in current['results']:
+        key = (result['scenario'], result['N'])
+        if key not in baseline_results:
+            continue
+        base = baseline_results[key]
+        for metric in compared_metrics:
+            if result[metric] > (1 + threshold)*base[metric]:
+                regressions.append(key + (metric, base[metric], result[metric]))
+        if result['iterations'] != base['iterations'] or \
+                abs(result['final_cost'] - base['final_cost']) > \
+                1e-6*abs(base['final_cost']):
+            changed.append(key)
+    return regressions, changed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark DiscreteTimeIterativeLQR on all scenarios.')
+    parser.add_argument('--scenarios', nargs='+', default=list(scenarios),
+                        choices=list(scenarios))
+    parser.add_argument('--scales', nargs='+', type=float, default=[0.5, 1., 2.],
+                        help='horizons as multiples of the scenario horizon')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-iterations', type=int, default=50)
+    parser.add_argument('--output', default=os.path.join('results', 'benchmark_results.json'),
+                        help='result file; its directory is created if needed')
+    parser.add_argument('--compare', help='result file of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    print("%18s %6s %12s %12s %6s %14s %10s" % (
+        "scenario", "N", "solve(ms)", "iter(ms)", "iters", "final cost", "peak(MB)"))
+    suite = RunSuite(args.scenarios, args.scales, args.repeats, args.max_iterations)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(suite, f, indent=1)
+
+    if not(args.compare is None):
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions, changed = CompareResults(baseline, suite, args.threshold)
+        for scenario, N, metric, base, value in regressions:
+            print("regression: %s N=%d %s %.4g -> %.4g (%+.1f%%)" % (
+                scenario, N, metric, base, value, 100*(value/base - 1)))
+        for scenario, N in changed:
+            print("solution changed: %s N=%d" % (scenario, N))
+        if len(regressions) > 0:
+            sys.exit(1)
@@ -0,0 +1,90 @@
+import argparse
+import sys
+import numpy as np
+from simulator import Simulate
+
+'''
+Checks that simulator.Simulate reproduces the drake diagram simulations of
+the quadrotor_*_simulation.py scripts (drake_simulation.SimulateDiagram),
+e.g.
+    python compare_simulators.py --tol 1e-3
+Both simulate the 3D quadrotor with the same controller, updated at the
+same period and held in between; Simulate integrates with fixed-step RK4,
+drake with its error-controlled integrator at accuracy 1e-6, and Simulate
+is interpolated at the sample times of drake's SignalLogger. Every
+case must agree within tol (max abs state error); the script exits with 1
+otherwise. Needs drake.
+'''
+
+
+def MakeLqrCase():
+    from quadrotor_LQR_simulation import (MakeLqrController, MakeInitialState,
+                                          control_period)
+    return MakeLqrController, MakeInitialState(), 5.0, control_period
+
+
+def MakeIlqrCase():
+    from scenarios import scenarios
+    from quadrotor_iterative_LQR_simulation import QuadLqrController
+    scenario = scenarios['quadrotor_3d']
+    traj_specs = scenario.MakeTrajSpecs(scenario.N)
+    x_nominal, u_nominal, J, k, K = scenario.MakePlanner().CalcTrajectory(
+        traj_specs, is_logging_trajectories=False, outputs='policy')
+    def MakeController():
+        return QuadLqrController(x_nominal, u_nominal, k, K, traj_specs.h)
+    return MakeController, traj_specs.x0, traj_specs.h*traj_specs.N, traj_specs.h
+
+
+def MakeMpcCase():
+    from scenarios import scenarios, MakeQuadrotor3DMpcSpecs
+    from quadrotor_iterative_LQR_MPC_simulation import QuadIlqrMpcController
+    planner = scenarios['quadrotor_3d'].MakePlanner()
+    traj_specs = MakeQuadrotor3DMpcSpecs()
+    def MakeController():
+        return QuadIlqrMpcController(planner, traj_specs)
+    return MakeController, traj_specs.x0, traj_specs.h*300, traj_specs.h
+
+
+# name: (case factory -> (controller factory, x0, t_final, control period)).
+cases = {'lqr': MakeLqrCase, 'ilqr': MakeIlqrCase, 'mpc': MakeMpcCase}
+
+
+'''
+Max abs difference between the states of Simulate (step h) and of the
+drake diagram, at the diagram's sample times. MakeController returns a
+new controller(x, t) for each simulation (MPC controllers have state).
+'''
+def CompareWithDiagram(MakeController, x0, t_final, period, h=0.001):
+    from drake_simulation import SimulateDiagram
+    from quadrotor3D import Quadrotor, CalcF, n, m
+    logger_x, logger_u = SimulateDiagram(Quadrotor(), MakeController(), x0, t_final,
+                                         period, n, m, accuracy=1e-6)
+    log = Simulate(CalcF, MakeController(), x0, t_final, h, control_period=period,
+                   integrator='rk4')
+    t_drake = logger_x.sample_times()
+    x_drake = logger_x.data().T
+    x_numpy = np.column_stack([np.interp(t_drake, log.sample_times(), log.x[0:log.size, j])
+                               for j in range(n)])
+    return np.max(np.abs(x_numpy - x_drake))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare simulator.Simulate with the drake diagram simulations.')
+    parser.add_argument('cases', nargs='*', default=['lqr', 'ilqr'],
+                        help='any of: ' + ', '.join(cases))
+    parser.add_argument('--tol', type=float, default=1e-3,
+                        help='max abs state error allowed')
+    parser.add_argument('--h', type=float, default=0.001,
+                        help='step of Simulate')
+    args = parser.parse_args()
+
+    is_failed = False
+    for name in args.cases:
+        MakeController, x0, t_final, period = cases[name]()
+        error = CompareWithDiagram(MakeController, x0, t_final, period, args.h)
+        print("%s: max state error %.3g (tol %.3g)" % (name, error, args.tol))
+        is_failed |= not(error <= args.tol)
+    if is_failed:
+        print("simulator.Simulate does not match the drake diagram")
+    sys.exit(1 if is_failed else 0)
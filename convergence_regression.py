@@ -0,0 +1,125 @@
+import argparse
+import json
+import sys
+import numpy as np
+from scenarios import scenarios, ParseOption
+from jacobian_cache import JacobianCache
+
+'''
+Solution-quality regression harness: checks that a change of the solver
+(or a solver option such as a derivative provider or a JacobianCache)
+keeps the solutions of a fixed catalogue of problems, all scenarios of
+scenarios.py with the horizons of their example scripts, and reports its
+speed alongside.
+
+For every problem it records the final cost J, the iterations to converge,
+the terminal error |x[N] - xg| and the median solve time. A reference is
+recorded once, e.g. on the base revision,
+    python convergence_regression.py --record reference.json
+and later runs are checked against it,
+    python convergence_regression.py --check reference.json --jacobian-cache
+A problem is rejected if its final cost grew by more than
+--cost-tolerance (relative), its terminal error by more than
+--terminal-tolerance (absolute), or it needs more than
+--extra-iterations additional iterations. The script exits with status 1
+if any problem is rejected.
+'''
+
+
+def RunProblem(scenario, planner_options, repeats, max_iterations):
+    traj_specs = scenario.MakeTrajSpecs(scenario.N)
+    planner = scenario.MakePlanner(max_iterations=max_iterations, **planner_options)
+    solve_times = np.zeros(repeats)
+    for r in range(repeats):
+        x, u, J, QN, Vx, Vxx, k, K, stats = planner.CalcTrajectory(
+            traj_specs, is_logging_trajectories=False, is_returning_stats=True)
+        solve_times[r] = stats.total_time
+    return {'final_cost': float(J[-1]),
+            'iterations': stats.num_iterations,
+            'terminal_error': float(np.linalg.norm(x[-1] - traj_specs.xg)),
+            'solve_time': float(np.median(solve_times))}
+
+
+def RunCatalogue(names, planner_options, repeats, max_iterations):
+    return {name: RunProblem(scenarios[name], planner_options, repeats, max_iterations)
+            for name in names}
+
+
+'''
+Compares results with a reference, both {problem: result}. Returns
+{problem: (is_accepted, reasons)} for the problems in both.
+'''
+def CheckResults(reference, results, cost_tolerance=1e-4, terminal_tolerance=1e-3,
+                 extra_iterations=0):
+    verdicts = {}
+    for name, result in results.items():
+        if name not in reference:
+            continue
+        ref = reference[name]
+        reasons = []
+        if result['final_cost'] > ref['final_cost'] + \
+                cost_tolerance*abs(ref['final_cost']):
+            reasons.append('final cost')
+        if result['terminal_error'] > ref['terminal_error'] + terminal_tolerance:
+            reasons.append('terminal error')
+        if result['iterations'] > ref['iterations'] + extra_iterations:
+            reasons.append('iterations')
+        verdicts[name] = (len(reasons) == 0, reasons)
+    return verdicts
+
+
+def PrintComparison(reference, results, verdicts):
+    print("%18s %14s %10s %9s %19s %10s %8s" % (
+        "problem", "final cost", "drift", "iters", "terminal error",
+        "time(ms)", "speedup"))
+    for name, result in results.items():
+        if not(name in verdicts):
+            continue
+        ref = reference[name]
+        is_accepted, reasons = verdicts[name]
+        print("%18s %14.8g %+10.2e %4d->%-4d %9.2e->%-9.2e %10.2f %7.2fx  %s" % (
+            name, result['final_cost'],
+            (result['final_cost'] - ref['final_cost'])/abs(ref['final_cost']),
+            ref['iterations'], result['iterations'],
+            ref['terminal_error'], result['terminal_error'],
+            1e3*result['solve_time'], ref['solve_time']/result['solve_time'],
+            "ok" if is_accepted else "REJECTED (%s)" % ", ".join(reasons)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Solution-quality regression check of the iLQR solver.')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--record', help='write reference results to this file')
+    group.add_argument('--check', help='compare with this reference file')
+    parser.add_argument('--problems', nargs='+', default=list(scenarios),
+                        choices=list(scenarios))
+    parser.add_argument('--option', action='append', default=[],
+                        help='planner option key=value, e.g. derivatives="complex_step"')
+    parser.add_argument('--jacobian-cache', action='store_true')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-iterations', type=int, default=50)
+    parser.add_argument('--cost-tolerance', type=float, default=1e-4)
+    parser.add_argument('--terminal-tolerance', type=float, default=1e-3)
+    parser.add_argument('--extra-iterations', type=int, default=0)
+    args = parser.parse_args()
+
+    planner_options = dict(ParseOption(option) for option in args.option)
+    if args.jacobian_cache:
+        planner_options['jacobian_cache'] = JacobianCache()
+    results = RunCatalogue(args.problems, planner_options, args.repeats,
+                           args.max_iterations)
+
+    if not(args.record is None):
+        with open(args.record, 'w') as f:
+            json.dump(results, f, indent=1)
+        for name, result in results.items():
+            print(name, result)
+    else:
+        with open(args.check) as f:
+            reference = json.load(f)
+        verdicts = CheckResults(reference, results, args.cost_tolerance,
+                                args.terminal_tolerance, args.extra_iterations)
+        PrintComparison(reference, results, verdicts)
+        if not all(is_accepted for is_accepted, reasons in verdicts.values()):
+            sys.exit(1)
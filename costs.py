@@ -0,0 +1,295 @@
+import numpy as np
+from scipy.special import expit
+
+'''
+Composable cost functions for iLQR.
+
+A cost is a sum of terms, each of which evaluates its stage costs l[i] at
+all knots i = 0, ..., N of a trajectory x (N+1, n), u (N, m) in one call,
+with the absolute times t (N+1,) of the knots. The stage cost of knot N is
+the terminal cost. Terms follow the convention l = 1/2*dx'*Q*dx, so that
+lx = Q*dx and lxx = Q.
+
+Every term implements
+    CalcValues(x, u, t): (N+1,) stage costs,
+    AddDerivatives(x, u, t, lx, lu, lxx, luu): adds its derivatives to
+        lx (N+1, n), lu (N, m), lxx (N+1, n, n) and luu (N, m, m),
+and CostFunction sums them, so new terms can be added without touching
+the solver. Terms whose is_quadratic is True are quadratic in (x, u), so
+their derivatives at any point describe them exactly.
+
+Weight matrices that are diagonal (detected, or given as 1-D arrays of
+their diagonal) are applied with elementwise products. If the Hessians of
+all terms with respect to x (u) are diagonal (is_diagonal_x / is_diagonal_u),
+lxx (luu) is stored as its diagonal, (N+1, n) ((N, m)), which the backward
+passes accept in place of the full matrices.
+'''
+
+
+# Gaussian weight of a waypoint at time t_w, evaluated at the times t.
+def CalcGaussianDiscount(t, t_w, rho):
+    return np.sqrt(0.5*rho/np.pi)*np.exp(-0.5*rho*(t-t_w)**2)
+
+
+class Weight:
+    '''
+    Symmetric weight matrix Q, (n, n) or per row (K, n, n), kept as its
+    diagonal (n,) or (K, n) if it is diagonal. A 1-D array is the diagonal
+    of a constant weight; with is_diagonal_input, a 2-D array holds the
+    diagonals (K, n) of the rows.
+    '''
+    def __init__(self, Q, is_diagonal_input=False):
+        Q = np.asarray(Q, dtype=float)
+        if Q.ndim == 1 or is_diagonal_input:
+            self.is_varying = Q.ndim == 2
+            self.diagonal = Q
+            return
+        self.is_varying = Q.ndim == 3
+        diagonal = np.diagonal(Q, axis1=-2, axis2=-1)
+        if np.array_equal(Q, diagonal[..., None]*np.eye(Q.shape[-1])):
+            self.diagonal = diagonal.copy()
+        else:
+            self.diagonal = None
+            self.Q = Q
+
+    @property
+    def is_diagonal(self):
+        return not(self.diagonal is None)
+
+    @property
+    def matrix(self):
+        if self.is_diagonal:
+            return self.diagonal[..., None]*np.eye(self.diagonal.shape[-1])
+        return self.Q
+
+    # Q*dz[i] for all rows of dz (K, n).
+    def Multiply(self, dz):
+        if self.is_diagonal:
+            return dz*self.diagonal
+        if self.is_varying:
+            return np.einsum('ij,ijk->ik', dz, self.Q)
+        return dz.dot(self.Q)
+
+    # dz[i]'*Q*dz[i] for all rows of dz (K, n).
+    def CalcQuadraticForm(self, dz):
+        return (self.Multiply(dz)*dz).sum(axis=-1)
+
+    '''
+    Adds scale[i]*Q (scale (K,), or 1 if None) to lzz[i], where lzz is
+    (K, n, n), or (K, n) for diagonal Hessians, which requires a diagonal Q.
+    '''
+    def AddTo(self, lzz, scale=None):
+        if lzz.ndim == 2:
+            Q = self.diagonal
+        else:
+            Q = self.matrix
+        if scale is None:
+            lzz += Q
+        else:
+            lzz += scale.reshape((-1,) + (1,)*(lzz.ndim-1))*Q
+
+
+class QuadraticCost:
+    '''
+    1/2*(x[i]-xd)'*Q*(x[i]-xd) + 1/2*(u[i]-ud)'*R*(u[i]-ud) for i < N.
+    xd: (n,) or a time-varying reference (N+1, n); ud: (m,) or (N, m).
+    Q: (n, n) or per step (N, n, n); R: (m, m) or (N, m, m). Constant
+    diagonal weights can also be given as (n,), (m,).
+    Dense tracking of a reference therefore costs O(N), unlike one
+    waypoint per reference point.
+    '''
+    is_quadratic = True
+
+    def __init__(self, Q, R, xd, ud):
+        self.Q = Weight(Q)
+        self.R = Weight(R)
+        self.xd = np.asarray(xd)
+        self.ud = np.asarray(ud)
+        self.is_diagonal_x = self.Q.is_diagonal
+        self.is_diagonal_u = self.R.is_diagonal
+
+    def CalcValues(self, x, u, t):
+        N = u.shape[0]
+        dx = x[0:N] - (self.xd if self.xd.ndim == 1 else self.xd[0:N])
+        l = np.zeros(N+1)
+        l[0:N] = 0.5*(self.Q.CalcQuadraticForm(dx) +
+                      self.R.CalcQuadraticForm(u - self.ud))
+        return l
+
+    def AddDerivatives(self, x, u, t, lx, lu, lxx, luu):
+        N = u.shape[0]
+        dx = x[0:N] - (self.xd if self.xd.ndim == 1 else self.xd[0:N])
+        lx[0:N] += self.Q.Multiply(dx)
+        lu += self.R.Multiply(u - self.ud)
+        self.Q.AddTo(lxx[0:N])
+        self.R.AddTo(luu)
+
+
+class TerminalCost:
+    # 1/2*(x[N]-xd)'*QN*(x[N]-xd). xd: (n,), or (N+1, n) of which xd[N] is used.
+    is_quadratic = True
+    is_diagonal_u = True
+
+    def __init__(self, QN, xd):
+        self.QN = Weight(QN)
+        self.xd = np.asarray(xd)
+        self.is_diagonal_x = self.QN.is_diagonal
+
+    def CalcValues(self, x, u, t):
+        dx = x[-1:] - (self.xd if self.xd.ndim == 1 else self.xd[-1])
+        l = np.zeros(x.shape[0])
+        l[-1] = 0.5*self.QN.CalcQuadraticForm(dx)[0]
+        return l
+
+    def AddDerivatives(self, x, u, t, lx, lu, lxx, luu):
+        dx = x[-1:] - (self.xd if self.xd.ndim == 1 else self.xd[-1])
+        lx[-1] += self.QN.Multiply(dx)[0]
+        self.QN.AddTo(lxx[-1:])
+
+
+class WayPointSetCost:
+    '''
+    Sum over the K waypoints xw of xw_set (an iLQR.WayPointSet) of
+        1/2*(x[i]-xw.x)'*xw.W*(x[i]-xw.x)*discount(t[i]) for i < N,
+    where the discount is a Gaussian of width 1/sqrt(xw.rho) centred at
+    xw.t, evaluated with (N, K) broadcasts and matrix products instead of
+    one term per waypoint. With d (N, K) the discounts,
+        lxx[i] = sum_k d[i, k]*W[k],
+        lx[i] = lxx[i]*x[i] - sum_k d[i, k]*W[k]*xw[k].
+    '''
+    is_quadratic = True
+    is_diagonal_u = True
+
+    def __init__(self, xw_set):
+        self.xw_set = xw_set
+        self.W = Weight(xw_set.W, is_diagonal_input=xw_set.is_diagonal)
+        self.is_diagonal_x = self.W.is_diagonal
+        self.W_xw = self.W.Multiply(xw_set.x) # (K, n)
+
+    # discounts (N, K) of all waypoints at the times t (N,).
+    def CalcDiscounts(self, t):
+        return CalcGaussianDiscount(t[:, None], self.xw_set.t, self.xw_set.rho)
+
+    # (N, K) quadratic forms (x[i]-xw[k])'*W[k]*(x[i]-xw[k]).
+    def CalcQuadraticForms(self, x):
+        dx = x[:, None, :] - self.xw_set.x
+        if self.W.is_diagonal:
+            return np.einsum('ikj,kj,ikj->ik', dx, self.W.diagonal, dx)
+        W_dx = np.einsum('ikj,kjl->ikl', dx, self.W.Q, optimize=True)
+        return np.einsum('ikj,ikj->ik', W_dx, dx)
+
+    def CalcValues(self, x, u, t):
+        N = u.shape[0]
+        l = np.zeros(N+1)
+        l[0:N] = 0.5*(self.CalcDiscounts(t[0:N])*
+                      self.CalcQuadraticForms(x[0:N])).sum(axis=1)
+        return l
+
+    def AddDerivatives(self, x, u, t, lx, lu, lxx, luu):
+        N = u.shape[0]
+        d = self.CalcDiscounts(t[0:N])
+        if self.W.is_diagonal:
+            W_sum = d.dot(self.W.diagonal) # (N, n)
+            lx[0:N] += W_sum*x[0:N]
+        else:
+            W_sum = np.tensordot(d, self.W.Q, axes=1) # (N, n, n)
+            lx[0:N] += np.einsum('ijk,ik->ij', W_sum, x[0:N])
+        lx[0:N] -= d.dot(self.W_xw)
+        if lxx.ndim == 3 and W_sum.ndim == 2:
+            lxx[0:N] += W_sum[:, :, None]*np.eye(x.shape[1])
+        else:
+            lxx[0:N] += W_sum
+
+
+class BarrierCost:
+    '''
+    Smooth barrier keeping z[:, idx] within [lower, upper], where z is x
+    (all knots) or u, as selected by variable ('x' or 'u'):
+        l = weight/sharpness*(softplus(sharpness*(lower - z))
+                              + softplus(sharpness*(z - upper))),
+    summed over idx. It is convex and grows linearly with slope weight
+    outside the bounds; sharpness sets how soon it rises inside them.
+    lower/upper: scalars or arrays broadcast against idx; use -np.inf /
+    np.inf for one-sided bounds.
+    '''
+    is_quadratic = False
+    is_diagonal_x = True
+    is_diagonal_u = True
+
+    def __init__(self, variable, idx, lower, upper, weight=1., sharpness=10.):
+        assert variable in ('x', 'u')
+        self.variable = variable
+        self.idx = np.atleast_1d(idx)
+        self.lower = lower
+        self.upper = upper
+        self.weight = weight
+        self.sharpness = sharpness
+
+    # softplus arguments of the lower and upper bound, (num_knots, len(idx)).
+    def CalcArguments(self, x, u):
+        z = (x if self.variable == 'x' else u)[:, self.idx]
+        return self.sharpness*(self.lower - z), self.sharpness*(z - self.upper)
+
+    def CalcValues(self, x, u, t):
+        s_lower, s_upper = self.CalcArguments(x, u)
+        l_z = self.weight/self.sharpness*(np.logaddexp(0., s_lower) +
+                                          np.logaddexp(0., s_upper)).sum(axis=1)
+        l = np.zeros(x.shape[0])
+        l[0:l_z.size] = l_z
+        return l
+
+    def AddDerivatives(self, x, u, t, lx, lu, lxx, luu):
+        s_lower, s_upper = self.CalcArguments(x, u)
+        sig_lower = expit(s_lower)
+        sig_upper = expit(s_upper)
+        grad = self.weight*(sig_upper - sig_lower)
+        hess = self.weight*self.sharpness*(sig_lower*(1 - sig_lower) +
+                                           sig_upper*(1 - sig_upper))
+        l_z, l_zz = (lx, lxx) if self.variable == 'x' else (lu, luu)
+        l_z[:, self.idx] += grad
+        if l_zz.ndim == 2:
+            l_zz[:, self.idx] += hess
+        else:
+            l_zz[:, self.idx, self.idx] += hess
+
+
+class CostFunction:
+    def __init__(self, terms):
+        self.terms = list(terms)
+
+    @property
+    def is_quadratic(self):
+        return all(term.is_quadratic for term in self.terms)
+
+    # terms without is_diagonal_x / is_diagonal_u are taken to be dense.
+    @property
+    def is_diagonal_x(self):
+        return all(getattr(term, 'is_diagonal_x', False) for term in self.terms)
+
+    @property
+    def is_diagonal_u(self):
+        return all(getattr(term, 'is_diagonal_u', False) for term in self.terms)
+
+    # (N+1,) stage costs summed over all terms, or over the terms that are
+    # instances of term_types.
+    def CalcValues(self, x, u, t, term_types=None):
+        l = np.zeros(x.shape[0])
+        for term in self.terms:
+            if term_types is None or isinstance(term, term_types):
+                l += term.CalcValues(x, u, t)
+        return l
+
+    '''
+    lx (N+1, n), lu (N, m), lxx (N+1, n, n) or its diagonal (N+1, n), and
+    luu (N, m, m) or its diagonal (N, m).
+    '''
+    def CalcDerivatives(self, x, u, t):
+        N, m = u.shape
+        n = x.shape[1]
+        lx = np.zeros((N+1, n))
+        lu = np.zeros((N, m))
+        lxx = np.zeros((N+1, n) if self.is_diagonal_x else (N+1, n, n))
+        luu = np.zeros((N, m) if self.is_diagonal_u else (N, m, m))
+        for term in self.terms:
+            term.AddDerivatives(x, u, t, lx, lu, lxx, luu)
+        return lx, lu, lxx, luu
@@ -0,0 +1,126 @@
+import numpy as np
+
+'''
+Derivative providers for the discrete dynamics of DiscreteTimeIterativeLQR,
+for models that are not AutoDiff-compatible (plain float NumPy code).
+
+Both providers perturb all n+m directions at all N knots and evaluate the
+perturbed discrete dynamics with a single batched call of
+discretization.CalcNextStateBatch, so their cost is a few large NumPy
+operations instead of N calls of jacobian(CalcF, x_u).
+- CentralDifference: 2*N*(n+m) evaluations, truncation error O(eps^2) and
+  round-off error O(1e-16/eps).
+- ComplexStep: N*(n+m) evaluations of complex inputs, accurate to machine
+  precision for any small eps, but CalcFBatch must support complex arrays
+  (no abs, comparisons or float-typed buffers of the state).
+CalcFBatch(x, u) takes x (B, n) and u (B, m) and returns (B, n), e.g.
+quadrotor3D.CalcFBatch; MakeCalcFBatch wraps a non-batched CalcF(x_u).
+With columns (indices into (x, u)), only these directions are perturbed
+and the other columns of fx, fu are returned as zeros, e.g. to skip the
+constant columns of a sparsity.JacobianStructure.
+'''
+
+
+# CalcFBatch from CalcF(x_u) of a single state, looping over the batch.
+def MakeCalcFBatch(CalcF):
+    def CalcFBatch(x, u):
+        x_u = np.hstack((x, u))
+        return np.array([CalcF(x_u[b]) for b in range(x_u.shape[0])],
+                        dtype=x_u.dtype)
+    return CalcFBatch
+
+
+class CentralDifference:
+    # eps is scaled by max(1, |z_j|) for every coordinate z_j of (x, u).
+    def __init__(self, eps=1e-6):
+        self.eps = eps
+
+    '''
+    x (N, n), u (N, m): knots.
+    Returns fx (N, n, n) and fu (N, n, m) of the discrete dynamics.
+    '''
+    def CalcJacobians(self, CalcFBatch, discretization, x, u, h, columns=None):
+        N, n = x.shape
+        nz = n + u.shape[1]
+        if columns is None:
+            columns = np.arange(nz)
+        nc = len(columns)
+        z = np.hstack((x, u))
+        dz = self.eps*np.maximum(1., np.abs(z[:, columns])) # (N, nc)
+        Z = np.zeros((2, N, nc, nz))
+        Z[:] = z[:, None, :]
+        idx = np.arange(nc)
+        Z[0, :, idx, columns] += dz.T
+        Z[1, :, idx, columns] -= dz.T
+        Z = Z.reshape(-1, nz)
+        F = discretization.CalcNextStateBatch(CalcFBatch, Z[:, 0:n], Z[:, n:], h)
+        F = F.reshape(2, N, nc, n)
+        f_z = np.zeros((N, n, nz))
+        f_z[:, :, columns] = ((F[0] - F[1])/(2*dz[:, :, None])).transpose(0, 2, 1)
+        return f_z[:, :, 0:n], f_z[:, :, n:]
+
+
+class ComplexStep:
+    def __init__(self, eps=1e-20):
+        self.eps = eps
+
+    # same as CentralDifference.CalcJacobians.
+    def CalcJacobians(self, CalcFBatch, discretization, x, u, h, columns=None):
+        N, n = x.shape
+        nz = n + u.shape[1]
+        if columns is None:
+            columns = np.arange(nz)
+        nc = len(columns)
+        z = np.hstack((x, u))
+        Z = np.zeros((N, nc, nz), dtype=complex)
+        Z[:] = z[:, None, :]
+        Z[:, np.arange(nc), columns] += 1j*self.eps
+        Z = Z.reshape(-1, nz)
+        F = discretization.CalcNextStateBatch(CalcFBatch, Z[:, 0:n], Z[:, n:], h)
+        f_z = np.zeros((N, n, nz))
+        f_z[:, :, columns] = (F.imag/self.eps).reshape(N, nc, n).transpose(0, 2, 1)
+        return f_z[:, :, 0:n], f_z[:, :, n:]
+
+
+'''
+Second derivatives of the discrete dynamics for DDP: fzz (N, n, nz, nz),
+the Hessians with respect to z = (x, u) of all components of F at the
+knots x (N, n), u (N, m), nz = n+m. Each entry is the four-point central
+difference
+    (F(z+a+b) - F(z+a-b) - F(z-a+b) + F(z-a-b))/(4*|a|*|b|)
+along coordinates j <= l (a = eps_j*e_j, b = eps_l*e_l, eps scaled by
+max(1, |z_j|)), with all 4*N*P points (P pairs) in one batched call of
+discretization.CalcNextStateBatch; the error is O(eps^2) + O(1e-16/eps^2).
+With columns, only pairs of these coordinates are differentiated: the
+others have constant columns of [fx, fu] (see sparsity.JacobianStructure),
+so their second derivatives are zero.
+'''
+def CalcHessians(CalcFBatch, discretization, x, u, h, eps=1e-4, columns=None):
+    N, n = x.shape
+    nz = n + u.shape[1]
+    if columns is None:
+        columns = np.arange(nz)
+    j, l = np.triu_indices(len(columns))
+    j = np.asarray(columns)[j]
+    l = np.asarray(columns)[l]
+    P = j.size
+    z = np.hstack((x, u))
+    dz = eps*np.maximum(1., np.abs(z)) # (N, nz)
+    pairs = np.arange(P)
+    Z = np.zeros((4, N, P, nz))
+    Z[:] = z[:, None, :]
+    for s, (sign_j, sign_l) in enumerate(((1, 1), (1, -1), (-1, 1), (-1, -1))):
+        Z[s, :, pairs, j] += sign_j*dz[:, j].T
+        Z[s, :, pairs, l] += sign_l*dz[:, l].T
+    Z = Z.reshape(-1, nz)
+    F = discretization.CalcNextStateBatch(CalcFBatch, Z[:, 0:n], Z[:, n:], h)
+    F = F.reshape(4, N, P, n)
+    H = (F[0] - F[1] - F[2] + F[3])/(4*dz[:, j]*dz[:, l])[:, :, None] # (N, P, n)
+    fzz = np.zeros((N, n, nz, nz))
+    fzz[:, :, j, l] = H.transpose(0, 2, 1)
+    fzz[:, :, l, j] = H.transpose(0, 2, 1)
+    return fzz
+
+
+derivative_providers = {'central_difference': CentralDifference,
+                        'complex_step': ComplexStep}
@@ -0,0 +1,115 @@
+import numpy as np
+from scipy.linalg import expm
+
+'''
+Discrete-time dynamics x[i+1] = F(x[i], u[i]) obtained from the
+continuous-time CalcF(x_u) with an explicit Runge-Kutta method, u held
+constant over the step.
+
+The discrete Jacobians fx = dF/dx and fu = dF/du are computed consistently
+with F by chaining the Jacobians of CalcF at every stage:
+    x_s = x + h*sum_j(a[s,j]*k_j),  k_s = CalcF(x_s, u)
+    dk_s/dx = A_s*(I + h*sum_j(a[s,j]*dk_j/dx))
+    dk_s/du = A_s*h*sum_j(a[s,j]*dk_j/du) + B_s
+    fx = I + h*sum_s(b[s]*dk_s/dx),  fu = h*sum_s(b[s]*dk_s/du)
+where [A_s, B_s] = jacobian(CalcF, x_s_u). For forward Euler this reduces to
+fx = I + h*A, fu = h*B.
+'''
+
+
+class ExplicitRungeKutta:
+    # a: (S, S) strictly lower triangular Butcher matrix, b: (S,) weights.
+    def __init__(self, a, b):
+        self.a = np.asarray(a, dtype=float)
+        self.b = np.asarray(b, dtype=float)
+        self.num_stages = self.b.size
+        assert self.a.shape == (self.num_stages, self.num_stages)
+
+    def CalcNextState(self, CalcF, x, u, h):
+        k = np.zeros((self.num_stages, x.size))
+        for s in range(self.num_stages):
+            x_s = x + h*self.a[s, 0:s].dot(k[0:s])
+            k[s] = CalcF(np.hstack((x_s, u)))
+        return x + h*self.b.dot(k)
+
+    # CalcNextState for a batch of B states x (B, n) and inputs u (B, m),
+    # with CalcFBatch(x, u) returning (B, n), e.g. quadrotor3D.CalcFBatch.
+    # Complex x and u are supported if CalcFBatch supports them.
+    def CalcNextStateBatch(self, CalcFBatch, x, u, h):
+        k = np.zeros((self.num_stages,) + x.shape, dtype=np.result_type(x, u))
+        for s in range(self.num_stages):
+            x_s = x + h*np.tensordot(self.a[s, 0:s], k[0:s], axes=1)
+            k[s] = CalcFBatch(x_s, u)
+        return x + h*np.tensordot(self.b, k, axes=1)
+
+    '''
+    CalcJacobian(CalcF, x_u) returns the (n, n+m) Jacobian of CalcF at x_u,
+    e.g. pydrake.forwarddiff.jacobian.
+    Returns fx (n, n) and fu (n, m) of the discrete dynamics at (x, u).
+    '''
+    def CalcJacobians(self, CalcF, CalcJacobian, x, u, h):
+        n = x.size
+        m = u.size
+        k = np.zeros((self.num_stages, n))
+        dk_dx = np.zeros((self.num_stages, n, n))
+        dk_du = np.zeros((self.num_stages, n, m))
+        for s in range(self.num_stages):
+            a_s = self.a[s, 0:s]
+            x_s = x + h*a_s.dot(k[0:s])
+            x_s_u = np.hstack((x_s, u))
+            k[s] = CalcF(x_s_u)
+            f_x_u = CalcJacobian(CalcF, x_s_u)
+            A_s = f_x_u[:, 0:n]
+            B_s = f_x_u[:, n:n+m]
+            dx_s_dx = np.eye(n) + h*np.tensordot(a_s, dk_dx[0:s], axes=1)
+            dx_s_du = h*np.tensordot(a_s, dk_du[0:s], axes=1)
+            dk_dx[s] = A_s.dot(dx_s_dx)
+            dk_du[s] = A_s.dot(dx_s_du) + B_s
+        fx = np.eye(n) + h*np.tensordot(self.b, dk_dx, axes=1)
+        fu = h*np.tensordot(self.b, dk_du, axes=1)
+        return fx, fu
+
+
+class ForwardEuler(ExplicitRungeKutta):
+    def __init__(self):
+        ExplicitRungeKutta.__init__(self, [[0.]], [1.])
+
+
+class ExplicitMidpoint(ExplicitRungeKutta):
+    def __init__(self):
+        ExplicitRungeKutta.__init__(self, [[0., 0.],
+                                           [0.5, 0.]], [0., 1.])
+
+
+class RungeKutta4(ExplicitRungeKutta):
+    def __init__(self):
+        ExplicitRungeKutta.__init__(self, [[0., 0., 0., 0.],
+                                           [0.5, 0., 0., 0.],
+                                           [0., 0.5, 0., 0.],
+                                           [0., 0., 1., 0.]],
+                                    [1./6, 1./3, 1./3, 1./6])
+
+
+discretizations = {'euler': ForwardEuler,
+                   'midpoint': ExplicitMidpoint,
+                   'rk4': RungeKutta4}
+
+
+'''
+Exact zero-order-hold discretization of the linear (affine) dynamics
+x_dot = A*x + B*u + c over a step h:
+    x[i+1] = Ad*x[i] + Bd*u[i] + cd,
+computed with a single matrix exponential of the augmented system.
+'''
+def CalcZeroOrderHold(A, B, h, c=None):
+    n, m = B.shape
+    M = np.zeros((n+m+1, n+m+1))
+    M[0:n, 0:n] = A
+    M[0:n, n:n+m] = B
+    if not(c is None):
+        M[0:n, n+m] = c
+    Md = expm(h*M)
+    Ad = Md[0:n, 0:n]
+    Bd = Md[0:n, n:n+m]
+    cd = Md[0:n, n+m]
+    return Ad, Bd, cd
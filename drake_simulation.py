@@ -0,0 +1,71 @@
+import numpy as np
+from pydrake.systems.analysis import Simulator
+from pydrake.systems.framework import (DiagramBuilder, LeafSystem, BasicVector,
+                                       PortDataType)
+from pydrake.systems.primitives import SignalLogger
+
+'''
+Closed-loop simulation as a drake diagram (plant + controller LeafSystem +
+SignalLoggers), the way the quadrotor_*_simulation.py scripts used to build
+it. The scripts now simulate with simulator.Simulate; this is the
+reference it is checked against (compare_simulators.py) and is still
+available with the scripts' --drake option.
+'''
+
+
+# drake controller system applying any controller(x, t) -> u, updated
+#   every period seconds and held in between.
+class PolicyController(LeafSystem):
+    def __init__(self, controller, n, m, period):
+        LeafSystem.__init__(self)
+        self.controller = controller
+        self.DeclareInputPort(PortDataType.kVectorValued, n)
+        self.DeclareVectorOutputPort(BasicVector(m), self._DoCalcVectorOutput)
+        self.DeclareDiscreteState(m) # state of the controller system is u
+        self.DeclarePeriodicDiscreteUpdate(period_sec=period)
+
+    def _DoCalcDiscreteVariableUpdates(self, context, events, discrete_state):
+        # Call base method to ensure we do not get recursion.
+        LeafSystem._DoCalcDiscreteVariableUpdates(self, context, events, discrete_state)
+
+        new_control_input = discrete_state.get_mutable_vector().get_mutable_value()
+        x = self.EvalVectorInput(context, 0).get_value()
+        new_control_input[:] = self.controller(x, context.get_time())
+
+    def _DoCalcVectorOutput(self, context, y_basic_vector):
+        control_output = context.get_discrete_state_vector().get_value()
+        y = y_basic_vector.get_mutable_value()
+        y[:] = control_output
+
+
+'''
+Simulates plant (a drake system with one input and its state as output)
+from x0 for t_final seconds, with controller(x, t) updated every period
+seconds. accuracy: target accuracy of drake's error-controlled integrator
+(its default if None). Returns the SignalLoggers of the states and of the
+inputs.
+'''
+def SimulateDiagram(plant, controller, x0, t_final, period, n, m, accuracy=None):
+    builder = DiagramBuilder()
+    plant = builder.AddSystem(plant)
+
+    # Create a simple block diagram containing our system.
+    controller = builder.AddSystem(PolicyController(controller, n, m, period))
+    logger_x = builder.AddSystem(SignalLogger(n))
+    logger_u = builder.AddSystem(SignalLogger(m))
+
+    builder.Connect(controller.get_output_port(0), plant.get_input_port(0))
+    builder.Connect(plant.get_output_port(0), logger_x.get_input_port(0))
+    builder.Connect(plant.get_output_port(0), controller.get_input_port(0))
+    builder.Connect(controller.get_output_port(0), logger_u.get_input_port(0))
+    diagram = builder.Build()
+
+    # Create the simulator and set the initial conditions, x(0).
+    simulator = Simulator(diagram)
+    if not(accuracy is None):
+        simulator.get_mutable_integrator().set_target_accuracy(accuracy)
+    state = simulator.get_mutable_context().get_mutable_continuous_state_vector()
+    state.SetFromVector(np.asarray(x0, dtype=float))
+
+    simulator.StepTo(t_final)
+    return logger_x, logger_u
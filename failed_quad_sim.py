@@ -10,6 +10,7 @@ from pydrake.forwarddiff import jacobian
 from pydrake.all import LinearQuadraticRegulator
 from pydrake.systems.framework import VectorSystem
 import matplotlib.pyplot as plt
+from discretization import CalcZeroOrderHold
 # for meshcat
 import time
 import meshcat
@@ -622,12 +623,14 @@ def one_rotor_loss():
     x0[1] = 5
     x[0] = x0
 
+    # the reduced model is linear: discretize it exactly once.
+    Ad, Bd, cd = CalcZeroOrderHold(Ae, Be, dt)
+
     for i in range(N):
         x_u = np.hstack((x[i], -K0.dot(x[i]-xd) + ud))
         all_p[i+N] = x[i,0]
         all_q[i+N] = x[i,1]
-        xDot = Ae.dot(x[i]) + Be.dot(x_u[n:n+m])
-        x[i+1] = x[i] + dt*xDot
+        x[i+1] = Ad.dot(x[i]) + Bd.dot(x_u[n:n+m])
         # print(x[i,1])
 
         u_i = -K0.dot(x[i]-xd) + ud
@@ -1,8 +1,19 @@
 from pydrake.forwarddiff import jacobian
-from pydrake.all import LinearQuadraticRegulator
+from pydrake.systems.controllers import LinearQuadraticRegulator
+import copy
+import itertools
+import logging
+import time
 import numpy as np
 from numpy import linalg as LA
-import matplotlib.pyplot as plt
+from scipy.linalg import solve_discrete_are
+from discretization import discretizations, CalcZeroOrderHold
+from backward_pass import backward_passes, AddHessian, AsMatrix, BackwardPassWorkspace
+from derivatives import derivative_providers, MakeCalcFBatch, CalcHessians
+from costs import CostFunction, QuadraticCost, TerminalCost, WayPointSetCost, \
+    CalcGaussianDiscount
+from solver_stats import SolverStats
+from solver_log import IterationRecord, ReportIteration, logger
 # Notations in this code follow "Synthesis and stabilization of complex 
 # behaviors th
     
@@ -18,29 +29,319 @@ class WayPoint:
         self.t = t # t should be the absolute simulation time. 
         self.W = W
         self.rho = rho
+
+
+# K waypoints packed into stacked arrays x (K, n), t (K,), rho (K,) and
+#   W (K, n, n), or the diagonals of the weights (K, n), so that their costs
+#   are single broadcast expressions (costs.WayPointSetCost). Indexing and
+#   iterating give WayPoints, so it can be used in place of a list of them.
+class WayPointSet:
+    __slots__ = ('x', 't', 'W', 'rho')
+
+    def __init__(self, x, t, W, rho):
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        K, n = x.shape
+        t = np.asarray(t, dtype=float).reshape(K)
+        W = np.asarray(W, dtype=float)
+        rho = np.asarray(rho, dtype=float).reshape(K)
+        assert W.shape in ((K, n), (K, n, n))
+        assert (t >= 0).all()
+        assert (rho > 0).all()
+        self.x = x
+        self.t = t
+        self.W = W
+        self.rho = rho
+
+    # xw_list: list of WayPoints, or a WayPointSet, which is returned as is.
+    @classmethod
+    def FromWayPoints(cls, xw_list):
+        if isinstance(xw_list, cls):
+            return xw_list
+        return cls(np.array([xw.x for xw in xw_list]),
+                   np.array([xw.t for xw in xw_list]),
+                   np.array([xw.W for xw in xw_list]),
+                   np.array([xw.rho for xw in xw_list]))
+
+    @property
+    def is_diagonal(self):
+        return self.W.ndim == 2
+
+    def __len__(self):
+        return self.x.shape[0]
+
+    def __getitem__(self, i):
+        W = np.diag(self.W[i]) if self.is_diagonal else self.W[i]
+        return WayPoint(self.x[i], self.t[i], W, self.rho[i])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
     
+# xd, ud: goal state and input (n,), (m,), or time-varying references
+#   (N+1, n), (N, m) to track, whose last entries are the goal.
+# Q, R: tracking weights (n, n), (m, m), or per step (N, n, n), (N, m, m).
+#   Constant diagonal weights can also be given as their diagonals (n,), (m,).
+# xw_list: list of WayPoints or a WayPointSet, stored as a WayPointSet.
+# cost_terms: optional list of additional cost terms (see costs.py), e.g.
+#   costs.BarrierCost.
 class TrajectorySpecs:
-    def __init__(self, x0, u0, xd, ud, h, N, Q, R, QN = None, xw_list=None):
+    def __init__(self, x0, u0, xd, ud, h, N, Q, R, QN = None, xw_list=None,
+                 cost_terms=None):
         self.x0 = x0
         self.u0 = u0
-        self.xd = xd
-        self.ud = ud
+        self.xd = np.asarray(xd)
+        self.ud = np.asarray(ud)
         self.h = h
         self.N = N
-        self.Q = Q
-        self.R = R
+        self.Q = np.asarray(Q)
+        self.R = np.asarray(R)
         self.QN = QN
+        if not(xw_list is None) and len(xw_list) > 0:
+            xw_list = WayPointSet.FromWayPoints(xw_list)
+        else:
+            xw_list = None
         self.xw_list = xw_list
+        self.cost_terms = cost_terms
+        assert self.xd.shape[-1] == np.size(x0)
+        assert self.xd.ndim == 1 or self.xd.shape[0] == N+1
+        assert self.ud.ndim == 1 or self.ud.shape[0] == N
+        assert self.Q.ndim <= 2 or self.Q.shape[0] == N
+        assert self.R.ndim <= 2 or self.R.shape[0] == N
+
+    # copy with the initial state and input replaced, e.g. for every MPC
+    # step, leaving these specs unchanged.
+    def WithInitialConditions(self, x0, u0):
+        traj_specs = copy.copy(self)
+        traj_specs.x0 = np.array(x0, dtype=float)
+        traj_specs.u0 = np.array(u0, dtype=float)
+        return traj_specs
+
+    # goal state, goal input and the weights there, used for the LQR
+    # terminal cost, tail and initial guess.
+    @property
+    def xg(self):
+        return self.xd if self.xd.ndim == 1 else self.xd[-1]
+
+    @property
+    def ug(self):
+        return self.ud if self.ud.ndim == 1 else self.ud[-1]
+
+    @property
+    def Qg(self):
+        return np.diag(self.Q) if self.Q.ndim == 1 else \
+            (self.Q if self.Q.ndim == 2 else self.Q[-1])
+
+    @property
+    def Rg(self):
+        return np.diag(self.R) if self.R.ndim == 1 else \
+            (self.R if self.R.ndim == 2 else self.R[-1])
     
 
+'''
+Per-solve state of DiscreteTimeIterativeLQR.CalcTrajectory:
+traj_specs: the specs being solved, a copy whose QN is filled in.
+cost: costs.CostFunction of traj_specs.
+jacobian_cache: this solve's JacobianCache (a fresh copy of the planner's),
+    or None.
+stats: solver_stats.SolverStats of the solve.
+callbacks: callables invoked with a solver_log.IterationRecord after the
+    initial guess and every iteration.
+solve_id: unique id of the solve, found in its IterationRecords.
+outputs: the outputs requested from CalcTrajectory (see solver_outputs).
+backward_pass_workspace: backward_pass.BackwardPassWorkspace reused by the
+    serial backward passes of the solve, or None.
+The planner methods that depend on the problem being solved take it as
+their context argument instead of reading planner attributes, so one
+planner can run several solves at once, e.g. MPC instances on a thread
+pool. Inputs such as traj_specs are never modified.
+'''
+class SolveContext:
+    solve_ids = itertools.count()
+
+    def __init__(self, traj_specs, cost, jacobian_cache=None, stats=None,
+                 callbacks=(), outputs='full'):
+        self.traj_specs = traj_specs
+        self.cost = cost
+        self.jacobian_cache = jacobian_cache
+        self.stats = SolverStats() if stats is None else stats
+        self.callbacks = list(callbacks)
+        self.outputs = outputs
+        self.backward_pass_workspace = None
+        self.solve_id = next(SolveContext.solve_ids)
+        self.t_start = time.perf_counter()
+
+
+'''
+Outputs of CalcTrajectory, selected with its outputs argument:
+'full': (x, u, J, QN, Vx, Vxx, k, K), with the trajectories of all
+    iterations if is_logging_trajectories.
+'policy': (x, u, J, k, K) of the final iteration; the value function is
+    not stored, only the two steps the backward pass needs at a time.
+'first_control': (u[0], K[0]), e.g. for MPC, without the value function.
+'''
+solver_outputs = ('full', 'policy', 'first_control')
+
+
+# result of SolveTrajectory (full, without logged trajectories) -> outputs.
+def SelectOutputs(result, outputs):
+    x, u, J, QN, Vx, Vxx, k, K = result
+    if outputs == 'policy':
+        return x, u, J, k, K
+    if outputs == 'first_control':
+        return u[0].copy(), K[0].copy()
+    return result
+
+
 class DiscreteTimeIterativeLQR:
-    def __init__(self, CalcF, n, m):
+    # discretization: 'euler', 'midpoint', 'rk4' or an ExplicitRungeKutta
+    #   instance, used to turn CalcF into x[i+1] = F(x[i], u[i]).
+    # is_linear: True if CalcF is linear (affine) in x and u, 'auto' to
+    #   detect it from the Jacobian of CalcF. Linear problems are solved
+    #   exactly with one Riccati recursion on the zero-order-hold
+    #   discretization instead of iterating.
+    # terminal_cost: how QN is computed when traj_specs.QN is None.
+    #   'continuous': cost-to-go of the continuous-time LQR about (xd, ud).
+    #   'discrete': cost-to-go of the discrete-time LQR of the discretized
+    #       dynamics (I + h*A, h*B for Euler), i.e. the infinite-horizon
+    #       value function of the problem being solved.
+    # tail_steps: number of steps of the infinite-horizon LQR policy about the
+    #   goal (CalcInfiniteHorizonTail) appended to the solution past the end
+    #   of the horizon, so that a short horizon can stand in for a long one.
+    #   The tail extends x, u, k (zeros), K (-Kd) and, with outputs='full',
+    #   Vx, Vxx (the LQR value function); J is the cost of the horizon only.
+    #   With terminal_cost='discrete', QN is the cost-to-go of the tail.
+    # backward_pass: 'serial', 'scan' (batched associative scan over the
+    #   horizon on one core, faster for long horizons) or a function with the signature
+    #   of backward_pass.CalcBackwardPass.
+    # mode: 'ilqr' (Gauss-Newton) or 'ddp', which adds the second-order
+    #   dynamics terms Vx'*fxx, Vx'*fuu, Vx'*fux to Qxx, Quu, Qux. The
+    #   dynamics Hessians are computed once per iteration by
+    #   CalcDynamicsHessians, and ddp mode requires the serial backward pass.
+    # regularization: minimum mu of ddp mode, added to Vxx[i+1] where it
+    #   enters Quu and Qux (see backward_pass.CalcBackwardPass). In ddp mode,
+    #   mu takes the place of most of the line search (Levenberg-Marquardt):
+    #   if neither the full step nor half of it decreases the cost, mu is
+    #   multiplied by regularization_factor and the backward pass repeated
+    #   with the same derivatives; after an accepted step, mu is reset to
+    #   regularization.
+    # max_iterations: maximum number of iterations (forward + backward passes).
+    # jacobian_cache: optional jacobian_cache.JacobianCache, which reuses or
+    #   Broyden-updates the dynamics Jacobians of steps that moved little
+    #   since the previous iteration. Every solve uses its own copy of it.
+    # derivatives: 'autodiff' (pydrake.forwarddiff.jacobian at every step),
+    #   'central_difference', 'complex_step' or a provider object of
+    #   derivatives.py, which differentiate all steps in one batched call of
+    #   CalcFBatch(x, u). If CalcFBatch is not given, it loops over CalcF.
+    #   The dynamics Hessians of ddp mode are always batched (see
+    #   CalcDynamicsHessians), so a vectorized CalcFBatch speeds them up
+    #   whatever derivatives is.
+    # jacobian_structure: optional sparsity.JacobianStructure of CalcF (e.g.
+    #   quadrotor3D.jacobian_structure). Only its varying block is
+    #   differentiated, and the backward pass skips the zero rows of fu.
+    # callbacks: callables invoked with a solver_log.IterationRecord after
+    #   the initial guess and every iteration of every solve, e.g. a
+    #   solver_log.IterationRecorder. Nothing is printed; the records are
+    #   also logged at DEBUG level on the 'ilqr' logger.
+    def __init__(self, CalcF, n, m, discretization='euler', is_linear=False,
+                 terminal_cost='continuous', tail_steps=0, backward_pass='serial', mode='ilqr',
+                 regularization=1e-3, regularization_factor=10., max_iterations=5,
+                 jacobian_cache=None,
+                 derivatives='autodiff', CalcFBatch=None, jacobian_structure=None,
+                 callbacks=None):
         self.CalcF = CalcF # dynamics
         self.n = n # number of states
         self.m = m # number of inputs
-        self.traj_specs = None # to be initialized in CalcTrajectory method.
+        if isinstance(discretization, str):
+            discretization = discretizations[discretization]()
+        self.discretization = discretization
+        self.is_linear = is_linear
+        assert terminal_cost in ('continuous', 'discrete')
+        self.terminal_cost = terminal_cost
+        self.lqr_cache = {} # (xd, ud, Q, R, h) -> discrete-time (K, P).
+        assert tail_steps >= 0
+        self.tail_steps = tail_steps
+        if isinstance(backward_pass, str):
+            backward_pass = backward_passes[backward_pass]
+        self.BackwardPass = backward_pass
+        assert mode in ('ilqr', 'ddp')
+        if mode == 'ddp' and not(backward_pass is backward_passes['serial']):
+            raise ValueError("mode='ddp' requires the serial backward pass.")
+        self.mode = mode
+        self.regularization = regularization
+        self.regularization_factor = regularization_factor
+        self.max_iterations = max_iterations
+        self.callbacks = [] if callbacks is None else list(callbacks)
+        self.jacobian_cache = jacobian_cache
+        if derivatives == 'autodiff':
+            derivatives = None
+        elif isinstance(derivatives, str):
+            derivatives = derivative_providers[derivatives]()
+        self.derivatives = derivatives
+        if CalcFBatch is None:
+            CalcFBatch = MakeCalcFBatch(CalcF)
+        self.CalcFBatch = CalcFBatch
+        self.jacobian_structure = jacobian_structure
+        # extra arguments of self.BackwardPass.
+        self.backward_pass_options = {}
+        self.constant_jacobians = None # (h, fx, fu) of the constant columns.
+        if not(jacobian_structure is None):
+            fu_rows, self.is_constant_col = jacobian_structure.CalcDiscretePattern(
+                self.discretization.num_stages)
+            self.backward_pass_options['fu_rows'] = fu_rows
+        # SolveContext of the last completed solve, used by the cost methods
+        # when they are called without a context. Solves never read it.
+        self.context = None
+
+    # specs and cost function of the last completed solve.
+    @property
+    def traj_specs(self):
+        return None if self.context is None else self.context.traj_specs
+
+    @property
+    def cost(self):
+        return None if self.context is None else self.context.cost
+
+    def ResolveContext(self, context):
+        return self.context if context is None else context
+
+    # new SolveContext for traj_specs, which is not modified, reporting to
+    # self.callbacks and the callbacks given.
+    def MakeSolveContext(self, traj_specs, callbacks=(), outputs='full'):
+        stats = SolverStats()
+        with stats.Time('lqr_init'):
+            traj_specs = self.InitializeTerminalCost(traj_specs)
+        jacobian_cache = None
+        if not(self.jacobian_cache is None):
+            jacobian_cache = self.jacobian_cache.Copy()
+        return SolveContext(traj_specs, self.MakeCostFunction(traj_specs),
+                            jacobian_cache, stats, self.callbacks + list(callbacks),
+                            outputs)
+
+    # keyword arguments of self.BackwardPass in a solve: backward_pass_options
+    # and, for the serial pass, the solve's BackwardPassWorkspace, which
+    # only keeps two steps of the value function unless it is returned.
+    def GetBackwardPassOptions(self, context):
+        if not(self.BackwardPass is backward_passes['serial']):
+            return self.backward_pass_options
+        if context.backward_pass_workspace is None:
+            context.backward_pass_workspace = BackwardPassWorkspace(
+                context.traj_specs.N, self.n, self.m, context.outputs == 'full')
+        options = dict(self.backward_pass_options)
+        options['workspace'] = context.backward_pass_workspace
+        return options
+
+    # reports the state of the solve after the initial guess (iteration 0)
+    # and every iteration to its callbacks and the log.
+    def ReportIteration(self, context, iteration, cost, line_search_trials=0,
+                        max_defect=0., regularization=None):
+        if len(context.callbacks) == 0 and not(logger.isEnabledFor(logging.DEBUG)):
+            return
+        ReportIteration(context.callbacks, IterationRecord(
+            context.solve_id, iteration, cost, line_search_trials, max_defect,
+            regularization, time.perf_counter() - context.t_start))
         
     def PlotCosts(self, x, u, xd, ud, Q, R, QN, xw_list, h):
+        import matplotlib.pyplot as plt # only when plotting.
         t0 = 0
         N = u.shape[0]
         t = np.array([i*h for i in range(N)])
@@ -83,140 +384,441 @@ class DiscreteTimeIterativeLQR:
         
         plt.show()
 
-    # xw is a WayPoint
-    def discount(self, xw, i, t0):
-        t = i * self.traj_specs.h + t0
-        return np.sqrt(0.5*xw.rho/np.pi)*np.exp(-0.5*xw.rho*(t-xw.t)**2)
-  
-    def CalcLqrCost(self, x, u, i0):
+    # xw is a WayPoint, or a WayPointSet for the discounts of all its waypoints.
+    def discount(self, xw, i, t0, context=None):
+        t = i * self.ResolveContext(context).traj_specs.h + t0
+        return CalcGaussianDiscount(t, xw.t, xw.rho)
+
+    '''
+    Cost function of traj_specs: tracking and terminal costs, a
+    WayPointSetCost of all waypoints and traj_specs.cost_terms.
+    '''
+    def MakeCostFunction(self, traj_specs):
+        terms = [QuadraticCost(traj_specs.Q, traj_specs.R, traj_specs.xd, traj_specs.ud),
+                 TerminalCost(traj_specs.QN, traj_specs.xd)]
+        if not(traj_specs.xw_list is None):
+            terms.append(WayPointSetCost(traj_specs.xw_list))
+        if not(traj_specs.cost_terms is None):
+            terms += list(traj_specs.cost_terms)
+        return CostFunction(terms)
+
+    # absolute times of the knots of a trajectory with N steps.
+    def CalcKnotTimes(self, N, t0, context=None):
+        return t0 + self.ResolveContext(context).traj_specs.h*np.arange(N+1)
+
+    '''
+    Costs are reported without the factor 1/2 of the cost terms, i.e. as
+    sums of dx'*Q*dx, as they always have been.
+    Without a context, the cost methods evaluate the problem of the last
+    completed solve.
+    '''
+    def CalcLqrCost(self, x, u, i0, context=None):
+        context = self.ResolveContext(context)
         N = u.shape[0]
         assert(x.shape == (N+1, self.n))
         assert(u.shape == (N, self.m))
-        J = 0
-        for i in range(i0, N):
-            dx = x[i]-self.traj_specs.xd
-            du = u[i]-self.traj_specs.ud
-            J += dx.dot(self.traj_specs.Q.dot(dx))
-            J += du.dot(self.traj_specs.R.dot(du))   
-        dx_N = x[N] - self.traj_specs.xd
-        J += dx_N.dot(self.traj_specs.QN.dot(dx_N))
-        return J
-
-    def CalcWayPointsCost(self, x, i0, t0):
-        if self.traj_specs.xw_list is None:
-            return 0.
+        l = context.cost.CalcValues(x, u, self.CalcKnotTimes(N, 0., context),
+                                    term_types=(QuadraticCost, TerminalCost))
+        return 2*l[i0:].sum()
 
+    def CalcWayPointsCost(self, x, i0, t0, context=None):
+        context = self.ResolveContext(context)
         N = x.shape[0]-1
         assert(x.shape == (N+1, self.n))
-        W = 0.
-
-        for i in range(i0, N):
-            for xw in self.traj_specs.xw_list:
-                dx = x[i] - xw.x
-                W += dx.dot(xw.W.dot(dx))*self.discount(xw, i, t0)
-        return W
+        l = context.cost.CalcValues(x, np.zeros((N, self.m)),
+                                    self.CalcKnotTimes(N, t0, context),
+                                    term_types=(WayPointSetCost,))
+        return 2*l[i0:].sum()
   
     '''
     Calculates the cost-to-go J of a paricular trajectory (x[.], u[.])
     starting at time i0.
     '''  
-    def CalcJ(self, x, u, t0, i0=0):
-        assert(x.shape == (self.traj_specs.N+1, self.n))
-        assert(u.shape == (self.traj_specs.N, self.m))
-        J = 0
-        J += self.CalcLqrCost(x, u, i0)
-        J += self.CalcWayPointsCost(x, i0, t0)
-        return J
+    def CalcJ(self, x, u, t0, i0=0, context=None):
+        context = self.ResolveContext(context)
+        N = context.traj_specs.N
+        assert(x.shape == (N+1, self.n))
+        assert(u.shape == (N, self.m))
+        l = context.cost.CalcValues(x, u, self.CalcKnotTimes(N, t0, context))
+        return 2*l[i0:].sum()
   
-    # h: time step of iLQR
-    # N: horizon
-    # xd: goal/final state (should've been called xg)
-    # Ni: Number of iLQR iterations
-    # l(x,u) = 1/2*((x-xd)'*Q*(x-xd) + u'*R*u)
-    # xw: list of WayPoints
-    # terminal cost = 1/2*(x-xd)'*QN*(x-xd)
-    def CalcTrajectory(self, traj_specs, t0 = 0., is_logging_trajectories = True):
-        assert(traj_specs.xd.shape == (self.n,))
-        assert(traj_specs.ud.shape == (self.m,))
-
-        def CallLQR(x, u, Q, R):
-            f_x_u = jacobian(self.CalcF, np.hstack((x, u)))
-            A = f_x_u[:, 0:self.n] 
-            B = f_x_u[:, self.n:self.n+self.m]
-            K, P = LinearQuadraticRegulator(A, B, Q, R)
-            return K, P
-    
-        # linearize about target/goal position
-        if traj_specs.QN is None:
-            Kd, traj_specs.QN = CallLQR(traj_specs.xd, traj_specs.ud, \
-                               traj_specs.Q, traj_specs.R)
-        self.traj_specs = traj_specs
-        
-        # calculates lx
-        def CalcLx(xi, i, t0):
-            Lx = traj_specs.Q.dot(xi - traj_specs.xd)
-            # add contribution from waypoint weights
-            if not(traj_specs.xw_list is None):
-                for xw in traj_specs.xw_list:
-                    Lx += xw.W.dot(xi - xw.x)*self.discount(xw, i, t0)
-            return Lx
-            
-        # calculates lxx
-        def CalcLxx(i, t0):
-            Lxx = traj_specs.Q.copy()
-            if not(traj_specs.xw_list is None):
-                for xw in traj_specs.xw_list:
-                    Lxx += xw.W*self.discount(xw,i, t0)
-            return Lxx
-    
-        # allocate storage for derivatives
-        Qx = np.zeros((traj_specs.N, self.n))
-        Qxx = np.zeros((traj_specs.N, self.n, self.n))
-        Qu = np.zeros((traj_specs.N, self.m))
-        Quu = np.zeros((traj_specs.N, self.m, self.m))
-        Qux = np.zeros((traj_specs.N, self.m, self.n))
-        
-        delta_V = np.zeros(traj_specs.N+1)
-        Vx = np.zeros((traj_specs.N+1, self.n))
-        Vxx = np.zeros((traj_specs.N+1, self.n, self.n))
-        
-        k = np.zeros((traj_specs.N, self.m))
-        K = np.zeros((traj_specs.N, self.m, self.n))
-        
-        # storage for trajectories
+    '''
+    Infinite-horizon discrete-time LQR about the fixed point (xd, ud) of the
+    discretized dynamics x[i+1] = F(x[i], u[i]) with stage cost
+    (x-xd)'*Q*(x-xd) + (u-ud)'*R*(u-ud).
+    Returns K and P, where u = -K*(x-xd) + ud and P solves the discrete
+    algebraic Riccati equation. Results are cached, so repeated solves with
+    the same goal and weights (e.g. MPC) do not recompute them.
+    '''
+    def CalcDiscreteLqr(self, xd, ud, Q, R, h):
+        key = (xd.tobytes(), ud.tobytes(), Q.tobytes(), R.tobytes(), h)
+        if key in self.lqr_cache:
+            return self.lqr_cache[key]
+        fx, fu = self.discretization.CalcJacobians(self.CalcF, jacobian, xd, ud, h)
+        P = solve_discrete_are(fx, fu, Q, R)
+        P = 0.5*(P + P.T)
+        K = LA.solve(R + fu.T.dot(P.dot(fu)), fu.T.dot(P.dot(fx)))
+        self.lqr_cache[key] = (K, P)
+        return K, P
+
+    '''
+    Extends a trajectory ending at x_N past the end of the horizon with the
+    cached infinite-horizon policy u = -Kd*(x-xg) + ug about the goal
+    traj_specs.xg.
+    With terminal_cost='discrete', QN is the cost-to-go of exactly this
+    policy, so a short horizon followed by this tail behaves like a
+    long-horizon solution.
+    Returns x_tail (N_tail+1, n), starting with x_N, and u_tail (N_tail, m).
+    '''
+    def CalcInfiniteHorizonTail(self, traj_specs, x_N, N_tail):
+        Kd, Pd = self.CalcDiscreteLqr(traj_specs.xg, traj_specs.ug,
+                                      traj_specs.Qg, traj_specs.Rg, traj_specs.h)
+        x_tail = np.zeros((N_tail+1, self.n))
+        u_tail = np.zeros((N_tail, self.m))
+        x_tail[0] = x_N
+        for i in range(N_tail):
+            u_tail[i] = -Kd.dot(x_tail[i] - traj_specs.xg) + traj_specs.ug
+            x_tail[i+1] = self.discretization.CalcNextState(
+                self.CalcF, x_tail[i], u_tail[i], traj_specs.h)
+        return x_tail, u_tail
+
+    # result of SolveTrajectory extended by the tail_steps of the LQR tail
+    # (see tail_steps), for every logged iteration if x is (iterations,
+    # N+1, n).
+    def AppendInfiniteHorizonTail(self, traj_specs, result):
+        x, u, J, QN, Vx, Vxx, k, K = result
+        Kd, Pd = self.CalcDiscreteLqr(traj_specs.xg, traj_specs.ug,
+                                      traj_specs.Qg, traj_specs.Rg, traj_specs.h)
+        if x.ndim == 3:
+            tails = [self.CalcInfiniteHorizonTail(traj_specs, x_i[-1], self.tail_steps)
+                     for x_i in x]
+            x = np.concatenate((x, np.array([x_tail[1:] for x_tail, u_tail in tails])),
+                               axis=1)
+            u = np.concatenate((u, np.array([u_tail for x_tail, u_tail in tails])),
+                               axis=1)
+            x_tail = x[-1, -(self.tail_steps+1):]
+        else:
+            x_tail, u_tail = self.CalcInfiniteHorizonTail(traj_specs, x[-1], self.tail_steps)
+            x = np.vstack((x, x_tail[1:]))
+            u = np.vstack((u, u_tail))
+        k = np.vstack((k, np.zeros((self.tail_steps, self.m))))
+        K = np.concatenate((K, np.tile(-Kd, (self.tail_steps, 1, 1))))
+        # the value function is stored (outputs='full').
+        if not(Vx is None) and Vx.shape[0] == traj_specs.N+1:
+            Vx = np.vstack((Vx, (x_tail[1:] - traj_specs.xg).dot(Pd)))
+            Vxx = np.concatenate((Vxx, np.tile(Pd, (self.tail_steps, 1, 1))))
+        return x, u, J, QN, Vx, Vxx, k, K
+
+    '''
+    Returns True if CalcF is affine in (x, u): its Jacobian is the same at a
+    few random points. With is_linear='auto', the result is cached.
+    '''
+    def IsLinear(self, num_samples=3):
+        if self.is_linear != 'auto':
+            return self.is_linear
+        rng = np.random.RandomState(0)
+        f_x_u0 = jacobian(self.CalcF, np.zeros(self.n+self.m))
+        is_linear = True
+        for j in range(num_samples):
+            f_x_u = jacobian(self.CalcF, rng.randn(self.n+self.m))
+            if not np.allclose(f_x_u, f_x_u0, rtol=1e-9, atol=1e-12):
+                is_linear = False
+                break
+        self.is_linear = is_linear
+        return is_linear
+
+    '''
+    Solves the trajectory optimization problem for linear dynamics
+    x_dot = A*x + B*u + c and a quadratic cost (including the waypoint
+    costs), whose derivatives at x = 0, u = 0 describe it exactly. With the
+    exact zero-order-hold discretization
+    x[i+1] = Ad*x[i] + Bd*u[i] + cd, one backward Riccati recursion for
+    V(x) = 1/2*x'*P*x + p'*x gives the optimal policy u = K*x + k_ff.
+    No iterations or line search are needed.
+    Returns the same tuple as CalcTrajectory. Vx and Vxx are evaluated on
+    the returned (optimal) trajectory, about which k is zero. Unless
+    context.outputs is 'full', only the two steps of P and p the recursion
+    needs at a time are stored (as in backward_pass.BackwardPassWorkspace),
+    and Vx is None.
+    CalcTrajectory only takes this path if all cost terms are quadratic.
+    '''
+    def CalcLinearTrajectory(self, context, t0=0., is_logging_trajectories=True):
+        traj_specs = context.traj_specs
+        n = self.n
+        m = self.m
+        N = traj_specs.N
+        x_u = np.hstack((traj_specs.xg, traj_specs.ug))
+        f_x_u = jacobian(self.CalcF, x_u)
+        A = f_x_u[:, 0:n]
+        B = f_x_u[:, n:n+m]
+        c = np.asarray(self.CalcF(x_u), dtype=float) - f_x_u.dot(x_u)
+        Ad, Bd, cd = CalcZeroOrderHold(A, B, traj_specs.h, c)
+
+        # step i of P and p is stored in row i % num_value_rows.
+        num_value_rows = N+1 if context.outputs == 'full' else 2
+        P = np.zeros((num_value_rows, n, n))
+        p = np.zeros((num_value_rows, n))
+        K = np.zeros((N, m, n))
+        k_ff = np.zeros((N, m))
+        stats = context.stats
+        with stats.Time('cost_derivatives'):
+            lx, lu, lxx, luu = context.cost.CalcDerivatives(
+                np.zeros((N+1, n)), np.zeros((N, m)), self.CalcKnotTimes(N, t0, context))
+        with stats.Time('backward_pass'):
+            P[N % num_value_rows] = AsMatrix(lxx[N])
+            p[N % num_value_rows] = lx[N]
+            for i in range(N-1, -1, -1):
+                r = i % num_value_rows
+                r_next = (i+1) % num_value_rows
+                Pc_p = P[r_next].dot(cd) + p[r_next]
+                PA = P[r_next].dot(Ad)
+                Qxx = AddHessian(Ad.T.dot(PA), lxx[i])
+                Quu = AddHessian(Bd.T.dot(P[r_next].dot(Bd)), luu[i])
+                Qux = Bd.T.dot(PA)
+                Qx = lx[i] + Ad.T.dot(Pc_p)
+                Qu = lu[i] + Bd.T.dot(Pc_p)
+                K[i] = -LA.solve(Quu, Qux)
+                k_ff[i] = -LA.solve(Quu, Qu)
+                P[r] = Qxx + Qux.T.dot(K[i])
+                P[r] = 0.5*(P[r] + P[r].T)
+                p[r] = Qx + Qux.T.dot(k_ff[i])
+
+        x = np.zeros((N+1, n))
+        u = np.zeros((N, m))
+        x[0] = traj_specs.x0
+        with stats.Time('rollout'):
+            for i in range(N):
+                u[i] = K[i].dot(x[i]) + k_ff[i]
+                x[i+1] = Ad.dot(x[i]) + Bd.dot(u[i]) + cd
+        stats.num_jacobian_evaluations += 1
+
+        with stats.Time('cost_evaluation'):
+            J = np.array([self.CalcJ(x, u, t0, context=context)])
+        self.ReportIteration(context, 0, J[0])
+        Vx = None
+        if context.outputs == 'full':
+            Vx = np.einsum('ijk,ik->ij', P, x) + p
+        k = np.zeros((N, m))
+        if is_logging_trajectories:
+            return x.reshape(1, N+1, n), u.reshape(1, N, m), J, traj_specs.QN, Vx, P, k, K
+        else:
+            return x, u, J, traj_specs.QN, Vx, P, k, K
+
+    # continuous-time LQR about (x, u).
+    def CalcContinuousLqr(self, x, u, Q, R):
+        f_x_u = jacobian(self.CalcF, np.hstack((x, u)))
+        A = f_x_u[:, 0:self.n]
+        B = f_x_u[:, self.n:self.n+self.m]
+        K, P = LinearQuadraticRegulator(A, B, Q, R)
+        return K, P
+
+    # copy of traj_specs whose QN is computed from an LQR about the goal if
+    # it is not given. traj_specs is not modified.
+    def InitializeTerminalCost(self, traj_specs):
+        traj_specs = copy.copy(traj_specs)
+        if traj_specs.QN is None and self.terminal_cost == 'discrete':
+            Kd, traj_specs.QN = self.CalcDiscreteLqr(traj_specs.xg, traj_specs.ug,
+                                                     traj_specs.Qg, traj_specs.Rg, traj_specs.h)
+        elif traj_specs.QN is None:
+            Kd, traj_specs.QN = self.CalcContinuousLqr(traj_specs.xg, traj_specs.ug,
+                                                       traj_specs.Qg, traj_specs.Rg)
+        return traj_specs
+
+    '''
+    Derivatives of the cost along the trajectory (x, u), stacked over the
+    horizon: lx (N+1, n), lu (N, m), lxx (N+1, n, n), luu (N, m, m), where
+    lxx and luu are only their diagonals, (N+1, n) and (N, m), if all
+    weights are diagonal. lx[N], lxx[N] are the derivatives of the
+    terminal cost.
+    '''
+    def CalcCostDerivatives(self, x, u, t0, context):
+        return context.cost.CalcDerivatives(
+            x, u, self.CalcKnotTimes(u.shape[0], t0, context))
+
+    '''
+    Jacobians of the discrete dynamics along (x, u): fx (N, n, n), fu (N, n, m).
+    x_next (N, n): F(x[i], u[i]), only used by context.jacobian_cache.
+    Defaults to x[1:], i.e. (x, u) is a single rollout.
+    '''
+    def CalcDynamicsDerivatives(self, x, u, context, x_next=None):
+        h = context.traj_specs.h
+        def CalcJacobians(idx):
+            context.stats.num_jacobian_evaluations += len(idx)
+            return self.CalcJacobiansAt(x, u, idx, h)
+
+        if context.jacobian_cache is None:
+            return CalcJacobians(np.arange(u.shape[0]))
+        if x_next is None:
+            x_next = x[1:]
+        return context.jacobian_cache.CalcDynamicsDerivatives(
+            CalcJacobians, x, u, x_next)
+
+    '''
+    fx (len(idx), n, n), fu (len(idx), n, m) at the steps idx of (x, u).
+    With a jacobian_structure, the derivative providers only perturb the
+    columns that are not constant; the constant columns are computed once
+    per time step h.
+    '''
+    def CalcJacobiansAt(self, x, u, idx, h):
+        if not(self.derivatives is None) and self.jacobian_structure is None:
+            return self.derivatives.CalcJacobians(
+                self.CalcFBatch, self.discretization, x[idx], u[idx], h)
+        if not(self.derivatives is None):
+            # one tuple, replaced as a whole, so concurrent solves can share it.
+            constant_jacobians = self.constant_jacobians
+            if constant_jacobians is None or constant_jacobians[0] != h:
+                fx_c, fu_c = self.derivatives.CalcJacobians(
+                    self.CalcFBatch, self.discretization, x[0:1], u[0:1], h)
+                fx_c[:, :, ~self.is_constant_col[0:self.n]] = 0.
+                fu_c[:, :, ~self.is_constant_col[self.n:]] = 0.
+                constant_jacobians = (h, fx_c[0], fu_c[0])
+                self.constant_jacobians = constant_jacobians
+            fx, fu = self.derivatives.CalcJacobians(
+                self.CalcFBatch, self.discretization, x[idx], u[idx], h,
+                columns=np.nonzero(~self.is_constant_col)[0])
+            return fx + constant_jacobians[1], fu + constant_jacobians[2]
+
+        if self.jacobian_structure is None:
+            CalcJacobian = jacobian
+        else:
+            CalcJacobian = self.jacobian_structure.CalcJacobian
+        fx = np.zeros((len(idx), self.n, self.n))
+        fu = np.zeros((len(idx), self.n, self.m))
+        for j, i in enumerate(idx):
+            fx[j], fu[j] = self.discretization.CalcJacobians(
+                self.CalcF, CalcJacobian, x[i], u[i], h)
+        return fx, fu
+
+    '''
+    initialize first trajectory by 
+    simulating forward with LQR controller about x0.
+    '''
+    def CalcInitialTrajectory(self, traj_specs):
         x = np.zeros((traj_specs.N+1, self.n))
         u = np.zeros((traj_specs.N, self.m))
-        x_next = x.copy()
-        u_next = u.copy()
         x[0] = traj_specs.x0
-    
-        '''
-        initialize first trajectory by 
-        simulating forward with LQR controller about x0.
-        '''
         x0 = np.zeros(self.n)
         x0[0:3] = traj_specs.x0[0:3]
-        K0, P0 = CallLQR(x0, traj_specs.u0, traj_specs.Q, traj_specs.R)
+        K0, P0 = self.CalcContinuousLqr(x0, traj_specs.u0, traj_specs.Qg, traj_specs.Rg)
         for i in range(traj_specs.N):
             u[i] = -K0.dot(x[i]-traj_specs.x0) + traj_specs.u0
-            x_u = np.hstack((x[i], u[i]))
-            x[i+1] = x[i] + traj_specs.h*self.CalcF(x_u)
+            x[i+1] = self.discretization.CalcNextState(self.CalcF, x[i], u[i], traj_specs.h)
         
         '''
         initialize first trajectory by 
         simulating forward with LQR controller about xd.
         '''
-#        Kd, Qd = CallLQR(traj_specs.xd, traj_specs.ud, traj_specs.Q, traj_specs.R)
+#        Kd, Qd = self.CalcContinuousLqr(traj_specs.xd, traj_specs.ud, traj_specs.Q, traj_specs.R)
 #        for i in range(traj_specs.N):
 #            u[i] = -Kd.dot(x[i]-traj_specs.xd) + traj_specs.ud
 #            x_u = np.hstack((x[i], u[i]))
 #            x[i+1] = x[i] + traj_specs.h*self.CalcF(x_u)
+        return x, u
+
+    '''
+    Second derivatives of the discretized dynamics F along (x, u), for the
+    second-order terms of DDP: fzz (N, n, n+m, n+m), the Hessian of every
+    component of F with respect to z = (x, u), by derivatives.CalcHessians
+    in one batched call of CalcFBatch. With jacobian_structure, only the
+    pairs of its varying columns are differentiated. Returns fzz and the
+    number of evaluations of F. Override this to supply analytic second
+    derivatives.
+    '''
+    def CalcDynamicsHessians(self, x, u, h):
+        N = u.shape[0]
+        columns = None
+        if not(self.jacobian_structure is None):
+            columns = np.nonzero(~self.is_constant_col)[0]
+        fzz = CalcHessians(self.CalcFBatch, self.discretization, x[0:N], u, h,
+                           columns=columns)
+        num_columns = self.n + self.m if columns is None else len(columns)
+        return fzz, 2*num_columns*(num_columns + 1)*N
+
+    '''
+    Backward pass of ddp mode with the dynamics Hessians fzz of
+    CalcDynamicsHessians, starting from the regularization mu. If the pass
+    diverges (a singular Quu or a non-finite Vxx, as the second-order terms
+    can make the Riccati recursion unstable far from a solution), it is
+    repeated with mu multiplied by regularization_factor. Returns the policy
+    and value function of CalcBackwardPass, and the mu that was used.
+    '''
+    def CalcDdpBackwardPass(self, fx, fu, fzz, lx, lu, lxx, luu, Vx_N, Vxx_N, mu,
+                            context):
+        n = self.n
+        def CalcCurvature(i, Vx_next):
+            H = np.tensordot(Vx_next, fzz[i], axes=1)
+            return H[0:n, 0:n], H[n:, n:], H[n:, 0:n]
+
+        while True:
+            try:
+                result = self.BackwardPass(fx, fu, lx, lu, lxx, luu, None, Vx_N, Vxx_N,
+                                           CalcCurvature=CalcCurvature,
+                                           value_regularization=mu,
+                                           **self.GetBackwardPassOptions(context))
+                if np.isfinite(result[3]).all():
+                    return result + (mu,)
+            except LA.LinAlgError:
+                pass
+            if mu > 1e10:
+                raise LA.LinAlgError("the ddp backward pass diverges for mu up to %g" % mu)
+            mu *= self.regularization_factor
+
+    # h: time step of iLQR
+    # N: horizon
+    # xd: goal/final state (should've been called xg)
+    # Ni: Number of iLQR iterations
+    # l(x,u) = 1/2*((x-xd)'*Q*(x-xd) + u'*R*u)
+    # xw: list of WayPoints
+    # terminal cost = 1/2*(x-xd)'*QN*(x-xd)
+    # Re-entrant: all per-solve state is in a SolveContext and traj_specs is
+    # not modified, so concurrent calls may share one planner.
+    # is_returning_stats: if True, the solve's solver_stats.SolverStats is
+    #   appended to the returned tuple.
+    # callback: optional callable invoked with the IterationRecords of this
+    #   solve, in addition to self.callbacks.
+    # outputs: 'full', 'policy' or 'first_control' (see solver_outputs);
+    #   is_logging_trajectories only applies to 'full'.
+    def CalcTrajectory(self, traj_specs, t0 = 0., is_logging_trajectories = True,
+                       is_returning_stats = False, callback = None, outputs = 'full'):
+        assert(traj_specs.xd.shape[-1] == self.n)
+        assert(traj_specs.ud.shape[-1] == self.m)
+        assert outputs in solver_outputs
+
+        context = self.MakeSolveContext(
+            traj_specs, () if callback is None else (callback,), outputs)
+        result = self.SolveTrajectory(context, t0,
+                                      is_logging_trajectories and outputs == 'full')
+        if self.tail_steps > 0 and outputs != 'first_control':
+            result = self.AppendInfiniteHorizonTail(context.traj_specs, result)
+        stats = context.stats
+        stats.cost_history = result[2]
+        stats.num_iterations = len(result[2]) - 1
+        stats.total_time = time.perf_counter() - context.t_start
+        self.context = context
+        result = SelectOutputs(result, outputs)
+        if is_returning_stats:
+            return result + (stats,)
+        return result
+
+    def SolveTrajectory(self, context, t0, is_logging_trajectories):
+        traj_specs = context.traj_specs
+        if context.cost.is_quadratic and self.IsLinear():
+            return self.CalcLinearTrajectory(context, t0, is_logging_trajectories)
+    
+        # storage for trajectories
+        stats = context.stats
+        with stats.Time('lqr_init'):
+            x, u = self.CalcInitialTrajectory(traj_specs)
+        stats.num_dynamics_evaluations += traj_specs.N
+        x_next = x.copy()
+        u_next = u.copy()
         
         # logging
-        max_iterations = 5 # number of maximum iterations (forward + backward passes)
+        max_iterations = self.max_iterations
         J = np.zeros(max_iterations+1)
-        J[0] = self.CalcJ(x, u, t0)
-        print ("initial cost: ", J[0])
+        with stats.Time('cost_evaluation'):
+            J[0] = self.CalcJ(x, u, t0, context=context)
+        self.ReportIteration(context, 0, J[0])
         
         if is_logging_trajectories:
             x_log = x.copy()
@@ -230,73 +832,86 @@ class DiscreteTimeIterativeLQR:
         # to converge.
         
         j = 0 # iteration index
+        mu = self.regularization # ddp mode only
         while True:
-            # initialize boundary conditions
-            Vxx[traj_specs.N] = traj_specs.QN 
-            Vx[traj_specs.N] = traj_specs.QN.dot(x[traj_specs.N] - traj_specs.xd)    
-           
-            # backward pass
-            for i in range(traj_specs.N-1, -1, -1): # i = N-1, ....
-                lx = CalcLx(x[i], i, t0)
-                lu = traj_specs.R.dot(u[i] - traj_specs.ud)
-                lxx = CalcLxx(i, t0)
-                luu = traj_specs.R
-                x_u = np.hstack((x[i], u[i]))
-                f_x_u = jacobian(self.CalcF, x_u)
-                fx = traj_specs.h*f_x_u[:, 0:self.n] + np.eye(self.n)
-                fu = traj_specs.h*f_x_u[:, self.n:self.n+self.m]
-                
-                Qx[i] = lx + fx.T.dot(Vx[i+1])
-                Qu[i] = lu + fu.T.dot(Vx[i+1])
-                Qxx[i] = lxx + fx.T.dot(Vxx[i+1].dot(fx))
-                Quu[i] = luu + fu.T.dot(Vxx[i+1].dot(fu))
-                Qux[i] = fu.T.dot(Vxx[i+1].dot(fx))
-                
-                # compute k and K
-                k[i] = -LA.solve(Quu[i], Qu[i]) # Quu_inv.dot(Qu[i])
-                K[i] = -LA.solve(Quu[i], Qux[i]) # Quu_inv.dot(Qux[i])
-                
-                # update derivatives of V
-                #        delta_V[i] = 0.5*Qu[i].dot(k[i])
-                #        Vx[i] = Qx[i] + Qu[i].dot(K[i])
-                #        Vxx[i] = Qxx[i] + Qux[i].T.dot(K[i])
-                delta_V[i] = 0.5*k[i].dot(Quu[i].dot(k[i])) + Qu[i].dot(k[i])
-                Vx[i] = Qx[i] + K[i].T.dot(Quu[i].dot(k[i])) + K[i].T.dot(Qu[i]) + Qux[i].T.dot(k[i])
-                Vxx[i] = Qxx[i] + K[i].T.dot(Quu[i].dot(K[i])) + K[i].T.dot(Qux[i]) + Qux[i].T.dot(K[i])        
-        
-            # forward pass
-            del i
-            x_next[0] = x[0]
-            alpha = 1
-            line_search_count = 0
-
-            while True:  
-                for t in range(traj_specs.N):
-                    u_next[t] = u[t] + alpha*k[t] + K[t].dot(x_next[t] - x[t])
-                    x_u = np.hstack((x_next[t], u_next[t]))
-                    x_next[t+1] = x_next[t] + traj_specs.h*self.CalcF(x_u)
-                
-                J_new = self.CalcJ(x_next, u_next, t0=t0, i0=0)
-        
-                if J_new <=  J[j]:
-                    J[j+1] = J_new
-                    x = x_next.copy()
-                    u = u_next.copy()
-                    break
-                elif line_search_count > 5:
-                    J[j+1] = J_new
-                    break
-                else:
-                    alpha *= 0.5
-                    line_search_count += 1
+            # derivatives about the nominal trajectory
+            with stats.Time('cost_derivatives'):
+                lx, lu, lxx, luu = self.CalcCostDerivatives(x, u, t0, context)
+            with stats.Time('dynamics_derivatives'):
+                fx, fu = self.CalcDynamicsDerivatives(x, u, context)
+                if self.mode == 'ddp':
+                    fzz, num_evaluations = self.CalcDynamicsHessians(x, u, traj_specs.h)
+                    stats.num_dynamics_evaluations += num_evaluations
+
+            # in ddp mode, the backward and forward passes are repeated with
+            # a larger mu until the line search decreases the cost.
+            num_line_search_trials = 0
+            while True:
+                # backward pass, with boundary conditions from the terminal cost.
+                N = traj_specs.N
+                with stats.Time('backward_pass'):
+                    if self.mode == 'ddp':
+                        k, K, Vx, Vxx, delta_V, mu = self.CalcDdpBackwardPass(
+                            fx, fu, fzz, lx[0:N], lu, lxx[0:N], luu, lx[N], lxx[N], mu,
+                            context)
+                    else:
+                        k, K, Vx, Vxx, delta_V = self.BackwardPass(
+                            fx, fu, lx[0:N], lu, lxx[0:N], luu, None, lx[N], lxx[N],
+                            **self.GetBackwardPassOptions(context))
+
+                # forward pass
+                x_next[0] = x[0]
+                alpha = 1
+                line_search_count = 0
+                max_line_search_count = 1 if self.mode == 'ddp' else 6
+                is_accepted = False
+
+                while True:
+                    # a step that is too long can make the rollout overflow;
+                    # its cost is then inf or nan and the step is rejected.
+                    with stats.Time('rollout'), np.errstate(over='ignore', invalid='ignore'):
+                        for t in range(traj_specs.N):
+                            u_next[t] = u[t] + alpha*k[t] + K[t].dot(x_next[t] - x[t])
+                            x_next[t+1] = self.discretization.CalcNextState(
+                                self.CalcF, x_next[t], u_next[t], traj_specs.h)
+                    stats.num_dynamics_evaluations += traj_specs.N
+
+                    with stats.Time('cost_evaluation'), np.errstate(over='ignore', invalid='ignore'):
+                        J_new = self.CalcJ(x_next, u_next, t0=t0, i0=0, context=context)
+
+                    if J_new <=  J[j]:
+                        J[j+1] = J_new
+                        # the old nominal trajectory is the next rollout's buffer.
+                        x, x_next = x_next, x
+                        u, u_next = u_next, u
+                        is_accepted = True
+                        break
+                    elif line_search_count >= max_line_search_count:
+                        J[j+1] = J_new
+                        break
+                    else:
+                        alpha *= 0.5
+                        line_search_count += 1
+                num_line_search_trials += line_search_count + 1
+                if self.mode == 'ddp' and not(is_accepted) and mu < 1e10:
+                    mu *= self.regularization_factor
+                    continue
+                break
+            stats.line_search_trials.append(num_line_search_trials)
+            if self.mode == 'ddp':
+                stats.regularization.append(mu)
             if is_logging_trajectories:
                 x_log = np.append(x_log, x.reshape(1, x.shape[0], x.shape[1]), axis=0)
                 u_log = np.append(u_log, u.reshape(1, u.shape[0], u.shape[1]), axis=0)
-                
-            print("Iteration ", j, ", line search steps: ", line_search_count, ", J: ", J[j+1])   
+
+            self.ReportIteration(context, j+1, J[j+1], num_line_search_trials,
+                                 regularization=mu if self.mode == 'ddp' else None)
+            if self.mode == 'ddp' and is_accepted:
+                mu = self.regularization
             cost_reduction = (J[j] - J[j+1])/J[j]
             j += 1
-            if j >= max_iterations or cost_reduction < 0.01 or line_search_count > 5:
+            is_failed = not(is_accepted) if self.mode == 'ddp' else line_search_count > 5
+            if j >= max_iterations or cost_reduction < 0.01 or is_failed:
                 break
               
         if is_logging_trajectories:
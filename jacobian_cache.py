@@ -0,0 +1,108 @@
+import numpy as np
+
+'''
+Reuse of the dynamics Jacobians fx, fu between iLQR iterations.
+
+After the first iterations the nominal trajectory moves little, so
+recomputing jacobian(CalcF, x_u) at every step is mostly wasted. For every
+step i, with dz the change of (x[i], u[i]) since the last exact evaluation
+of fx[i], fu[i] (not since the previous iteration, so that many small
+moves cannot add up to a large drift unnoticed),
+- |dz|_inf <= reuse_tolerance: fx[i], fu[i] are reused unchanged,
+- |dz|_inf <= broyden_tolerance: fx[i], fu[i] get a rank-one Broyden
+  update satisfying the secant condition along the change since the
+  previous iteration,
+      fx[i]*dx + fu[i]*du = F(x[i], u[i]) - F(x_prev[i], u_prev[i]),
+  which needs no dynamics evaluations: F(x[i], u[i]) is x[i+1] of a single
+  rollout (x[i+1] + d[i] for multiple shooting),
+- otherwise they are recomputed exactly.
+All Jacobians are recomputed exactly on the first call after Reset and,
+if refresh_period is given, on every refresh_period-th call.
+'''
+
+
+class JacobianCache:
+    def __init__(self, reuse_tolerance=1e-3, broyden_tolerance=0.2,
+                 refresh_period=None):
+        assert reuse_tolerance <= broyden_tolerance
+        self.reuse_tolerance = reuse_tolerance
+        self.broyden_tolerance = broyden_tolerance
+        self.refresh_period = refresh_period
+        self.Reset()
+
+    # new, empty cache with the same settings, e.g. for every solve.
+    def Copy(self):
+        return JacobianCache(self.reuse_tolerance, self.broyden_tolerance,
+                             self.refresh_period)
+
+    # forgets the cached trajectory, e.g. at the start of a new solve.
+    def Reset(self):
+        self.x = None
+        self.u = None
+        self.x_next = None
+        # (x[i], u[i]) at the last exact evaluation of fx[i], fu[i].
+        self.x_exact = None
+        self.u_exact = None
+        self.fx = None
+        self.fu = None
+        self.num_calls = 0
+        # number of steps handled in each way over all calls since Reset.
+        self.counts = {'exact': 0, 'reused': 0, 'broyden': 0}
+
+    '''
+    CalcJacobians(idx): exact fx (len(idx), n, n), fu (len(idx), n, m) at
+        the steps idx.
+    x (N+1, n), u (N, m): nominal trajectory.
+    x_next (N, n): F(x[i], u[i]) for all i.
+    Returns fx (N, n, n), fu (N, n, m).
+    '''
+    def CalcDynamicsDerivatives(self, CalcJacobians, x, u, x_next):
+        N = u.shape[0]
+        is_refresh = self.fx is None or self.fx.shape[0] != N or \
+            (not(self.refresh_period is None) and
+             self.num_calls % self.refresh_period == 0)
+        if is_refresh:
+            fx = np.zeros((N, x.shape[1], x.shape[1]))
+            fu = np.zeros((N, x.shape[1], u.shape[1]))
+            is_exact = np.ones(N, dtype=bool)
+        else:
+            fx = self.fx.copy()
+            fu = self.fu.copy()
+            drift_max = np.maximum(np.abs(x[0:N] - self.x_exact).max(axis=1),
+                                   np.abs(u - self.u_exact).max(axis=1))
+            dx = x[0:N] - self.x[0:N]
+            du = u - self.u
+            dz_max = np.maximum(np.abs(dx).max(axis=1), np.abs(du).max(axis=1))
+            is_exact = drift_max > self.broyden_tolerance
+            # no secant along a step that did not move.
+            is_broyden = (drift_max > self.reuse_tolerance) & (dz_max > 0) & ~is_exact
+
+            # Broyden updates, for all such steps at once.
+            dx_b = dx[is_broyden]
+            du_b = du[is_broyden]
+            r = x_next[is_broyden] - self.x_next[is_broyden] - \
+                np.einsum('ijk,ik->ij', fx[is_broyden], dx_b) - \
+                np.einsum('ijk,ik->ij', fu[is_broyden], du_b)
+            r /= ((dx_b**2).sum(axis=1) + (du_b**2).sum(axis=1))[:, None]
+            fx[is_broyden] += r[:, :, None]*dx_b[:, None, :]
+            fu[is_broyden] += r[:, :, None]*du_b[:, None, :]
+            self.counts['broyden'] += is_broyden.sum()
+            self.counts['reused'] += N - is_exact.sum() - is_broyden.sum()
+
+        if is_refresh:
+            self.x_exact = x[0:N].copy()
+            self.u_exact = u.copy()
+        elif is_exact.any():
+            self.x_exact[is_exact] = x[0:N][is_exact]
+            self.u_exact[is_exact] = u[is_exact]
+        if is_exact.any():
+            fx[is_exact], fu[is_exact] = CalcJacobians(np.nonzero(is_exact)[0])
+        self.counts['exact'] += is_exact.sum()
+
+        self.x = x.copy()
+        self.u = u.copy()
+        self.x_next = x_next.copy()
+        self.fx = fx
+        self.fu = fu
+        self.num_calls += 1
+        return fx.copy(), fu.copy()
@@ -0,0 +1,53 @@
+import numpy as np
+from scenarios import scenarios
+
+'''
+The exact solver of linear problems (DiscreteTimeIterativeLQR with
+is_linear=True) with the infinite-horizon tail, for every value of the
+outputs argument of CalcTrajectory, e.g.
+    python linear_trajectory_test.py
+'''
+
+tail_steps = 10
+
+
+def SolveDoubleIntegrator(outputs):
+    scenario = scenarios['double_integrator']
+    planner = scenario.MakePlanner(is_linear=True, tail_steps=tail_steps)
+    traj_specs = scenario.MakeTrajSpecs(scenario.N)
+    return traj_specs, planner.CalcTrajectory(traj_specs, is_logging_trajectories=False,
+                                              outputs=outputs)
+
+
+def test_full_outputs_with_tail():
+    traj_specs, (x, u, J, QN, Vx, Vxx, k, K) = SolveDoubleIntegrator('full')
+    N = traj_specs.N
+    assert x.shape == (N+1+tail_steps, 2)
+    assert u.shape == (N+tail_steps, 1)
+    assert K.shape == (N+tail_steps, 1, 2)
+    assert Vx.shape == (N+1+tail_steps, 2)
+    assert Vxx.shape == (N+1+tail_steps, 2, 2)
+
+
+def test_policy_outputs_with_tail():
+    traj_specs, (x_full, u_full, J_full, QN, Vx, Vxx, k_full, K_full) = \
+        SolveDoubleIntegrator('full')
+    traj_specs, (x, u, J, k, K) = SolveDoubleIntegrator('policy')
+    assert np.array_equal(x, x_full)
+    assert np.array_equal(u, u_full)
+    assert np.array_equal(K, K_full)
+    assert np.array_equal(J, J_full)
+
+
+def test_first_control_outputs_with_tail():
+    traj_specs, (x, u, J, QN, Vx, Vxx, k, K) = SolveDoubleIntegrator('full')
+    traj_specs, (u0, K0) = SolveDoubleIntegrator('first_control')
+    assert np.array_equal(u0, u[0])
+    assert np.array_equal(K0, K[0])
+
+
+if __name__ == '__main__':
+    test_full_outputs_with_tail()
+    test_policy_outputs_with_tail()
+    test_first_control_outputs_with_tail()
+    print("linear trajectories: all tests passed")
@@ -0,0 +1,120 @@
+import numpy as np
+from numpy import linalg as LA
+
+'''
+Monte Carlo closed-loop evaluation of LQR/iLQR feedback gains.
+
+Instead of one Python Euler loop per perturbed initial condition, all B
+closed-loop trajectories are propagated together: the dynamics are
+evaluated with a batched CalcFBatch(x, u) (x: (B, n), u: (B, m), e.g.
+quadrotor3D.CalcFBatch) and the feedback u = -K(x-xd) + ud is applied
+to the whole ensemble with one matrix product per step.
+'''
+
+
+def EulerStepBatch(CalcFBatch, x, u, h):
+    return x + h*CalcFBatch(x, u)
+
+
+def Rk4StepBatch(CalcFBatch, x, u, h):
+    k1 = CalcFBatch(x, u)
+    k2 = CalcFBatch(x + 0.5*h*k1, u)
+    k3 = CalcFBatch(x + 0.5*h*k2, u)
+    k4 = CalcFBatch(x + h*k3, u)
+    return x + h/6.*(k1 + 2*k2 + 2*k3 + k4)
+
+
+batch_integrators = {'euler': EulerStepBatch, 'rk4': Rk4StepBatch}
+
+
+# x0 + scale * standard normal noise, one row per sample.
+def SampleInitialStates(x0, scale, B, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    x0 = np.asarray(x0, dtype=float)
+    return x0 + np.asarray(scale)*rng.standard_normal((B, x0.size))
+
+
+class MonteCarloResult:
+    '''
+    Per-sample outcomes of a Monte Carlo run, all arrays of length B.
+    success: finished within position_tolerance of the goal without diverging.
+    settling_time: time after which the position error stayed within
+        position_tolerance until the end of the simulation (inf if it never
+        settled).
+    max_attitude: largest |roll| or |pitch| (x[3], x[4]) seen along the
+        trajectory.
+    '''
+    def __init__(self, x_final, success, settling_time, max_attitude):
+        self.x_final = x_final
+        self.success = success
+        self.settling_time = settling_time
+        self.max_attitude = max_attitude
+
+    @property
+    def success_rate(self):
+        return self.success.mean()
+
+    def summary(self):
+        settled = self.settling_time[self.success]
+        return {'samples': self.success.size,
+                'success_rate': self.success_rate,
+                'settling_time_median': np.median(settled) if settled.size else np.inf,
+                'settling_time_max': settled.max() if settled.size else np.inf,
+                'max_attitude_median': np.median(self.max_attitude),
+                'max_attitude_max': self.max_attitude.max()}
+
+
+'''
+Simulates B closed-loop trajectories u = -K(x-xd) + ud from the rows of
+x0_batch for t_final seconds with step h.
+K: (m, n) LQR gain, or (N, m, n) time-varying gains (e.g. -K from iLQR
+    about x_nominal, u_nominal). xd: (n,) or (N+1, n); ud: (m,) or (N, m).
+    Time-varying arrays hold their last entry after the end of the horizon.
+Position error is measured on x[0:3], attitude on x[3:5]; set
+position_idx/attitude_idx for other models.
+'''
+def SimulateClosedLoopBatch(CalcFBatch, K, xd, ud, x0_batch, h, t_final,
+                            integrator='euler', position_tolerance=0.05,
+                            divergence_threshold=1e3,
+                            position_idx=slice(0, 3), attitude_idx=slice(3, 5)):
+    Step = batch_integrators[integrator]
+    x = np.array(x0_batch, dtype=float)
+    B = x.shape[0]
+    N = int(round(t_final/h))
+
+    K = np.asarray(K)
+    xd = np.asarray(xd)
+    ud = np.asarray(ud)
+    is_K_varying = K.ndim == 3
+    is_xd_varying = xd.ndim == 2
+    is_ud_varying = ud.ndim == 2
+
+    alive = np.ones(B, dtype=bool) # False once a sample diverges.
+    t_last_outside = np.full(B, -h)
+    max_attitude = np.abs(x[:, attitude_idx]).max(axis=1)
+
+    for i in range(N+1):
+        xd_i = xd[min(i, xd.shape[0]-1)] if is_xd_varying else xd
+        dx = x - xd_i
+        outside = LA.norm(dx[:, position_idx], axis=1) > position_tolerance
+        t_last_outside[outside] = i*h
+        if i == N:
+            break
+
+        K_i = K[min(i, K.shape[0]-1)] if is_K_varying else K
+        ud_i = ud[min(i, ud.shape[0]-1)] if is_ud_varying else ud
+        u = ud_i - dx.dot(K_i.T)
+        x[alive] = Step(CalcFBatch, x[alive], u[alive], h)
+
+        diverged = ~np.all(np.abs(x) < divergence_threshold, axis=1)
+        alive &= ~diverged
+        max_attitude = np.maximum(max_attitude,
+                                  np.abs(x[:, attitude_idx]).max(axis=1))
+
+    max_attitude[~alive] = np.inf
+    success = alive & (t_last_outside < N*h)
+    settling_time = np.where(success, t_last_outside + h, np.inf)
+
+    return MonteCarloResult(x, success, settling_time, max_attitude)
+
@@ -0,0 +1,329 @@
+import numpy as np
+from pydrake.forwarddiff import jacobian
+from iLQR import DiscreteTimeIterativeLQR
+
+'''
+Multiple-shooting iLQR.
+
+The horizon is split into segments whose start states are free variables.
+The initial guess rolls every segment out independently from its own start
+state, so the trajectory can have defects
+    d[i] = F(x[i], u[i]) - x[i+1]
+at the last step i of every segment but the last one. The backward pass
+includes the defects in the linearized dynamics
+    dx[i+1] = fx[i]*dx[i] + fu[i]*du[i] + d[i],
+and the forward pass rolls the segments out in order, every segment
+starting at the end state of the previous one minus (1-alpha) times the
+defect between them (the gap-scaled rollout of feasibility-driven DDP,
+"Crocoddyl: An Efficient and Versatile Framework for Multi-Contact Optimal
+Control" by C. Mastalli et al.). A step of length alpha thus shrinks the
+defects to exactly (1-alpha)*d on the nonlinear dynamics, and a full step
+closes them, however far the segments are from the linearization (e.g.
+when a waypoint forces aggressive maneuvers). Because the defects are only
+closed by accepted steps, a poor initial guess cannot make the trajectory
+diverge.
+The gap-scaled rollout is sequential across the segments, so the line
+search is parallelized over its step lengths instead: with
+batched_line_search, all step lengths 1, 1/2, ..., 1/64 are rolled out
+together, every time step being one call of CalcFBatch on all of them,
+and the longest step that reduces the merit is taken, as by backtracking.
+With a vectorized CalcFBatch (e.g. quadrotor3D.CalcFBatch), such a step
+costs about as much as a single one. Without it, the rollouts of the step
+lengths are mapped over the executor if one is given.
+The independent rollouts of the initial guess and the dynamics Jacobians
+of the segments are also mapped over the executor. CalcF (and
+jacobian_structure) must be picklable (module-level) for a process pool.
+'''
+
+
+'''
+Rolls out one segment from x_start with the policy
+u_new[i] = u[i] + alpha*k[i] + K[i]*(x_new[i] - x[i]).
+x (L+1, n) and u (L, m) are the segment's nominal states and inputs.
+Returns x_new (L+1, n), whose last entry is the predicted end state of the
+segment, and u_new (L, m).
+'''
+def RollOutSegment(CalcF, discretization, h, x_start, x, u, k, K, alpha):
+    L = u.shape[0]
+    x_new = np.zeros(x.shape)
+    u_new = np.zeros(u.shape)
+    x_new[0] = x_start
+    for i in range(L):
+        u_new[i] = u[i] + alpha*k[i] + K[i].dot(x_new[i] - x[i])
+        x_new[i+1] = discretization.CalcNextState(CalcF, x_new[i], u_new[i], h)
+    return x_new, u_new
+
+
+'''
+Rolls out the segments in order from x0 = x[0] with the policy of
+RollOutSegment, starting segment j+1 at the end state of segment j minus
+(1-alpha)*d at its end. Returns x (N+1, n), u (N, m) and the new defects
+(1-alpha)*d (N, n).
+'''
+def RollOutGapScaled(CalcF, discretization, h, bounds, x, u, d, k, K, alpha):
+    x_new = np.zeros(x.shape)
+    u_new = np.zeros(u.shape)
+    x_start = x[0]
+    for j in range(bounds.size - 1):
+        i0, i1 = bounds[j], bounds[j+1]
+        x_seg, u_new[i0:i1] = RollOutSegment(
+            CalcF, discretization, h, x_start, x[i0:i1+1], u[i0:i1],
+            k[i0:i1], K[i0:i1], alpha)
+        x_new[i0:i1] = x_seg[0:-1]
+        x_start = x_seg[-1] - (1-alpha)*d[i1-1]
+    x_new[-1] = x_start
+    return x_new, u_new, (1-alpha)*d
+
+
+# Jacobians fx (L, n, n), fu (L, n, m) of the discrete dynamics along a
+# segment, with CalcJacobian(f, z) computing df/dz (e.g. jacobian).
+def CalcSegmentJacobians(CalcF, CalcJacobian, discretization, h, x, u):
+    L, m = u.shape
+    n = x.shape[1]
+    fx = np.zeros((L, n, n))
+    fu = np.zeros((L, n, m))
+    for i in range(L):
+        fx[i], fu[i] = discretization.CalcJacobians(CalcF, CalcJacobian, x[i], u[i], h)
+    return fx, fu
+
+
+class MultipleShootingIterativeLQR(DiscreteTimeIterativeLQR):
+    # num_segments: number of shooting segments the horizon is split into.
+    # executor: optional concurrent.futures executor for the initial segment
+    #   rollouts, the segment Jacobians and the line search (unless it is
+    #   batched); None (default) runs them serially.
+    # batched_line_search: True to roll out all step lengths of the line
+    #   search in one batch through CalcFBatch (see above), 'auto' (default)
+    #   if a CalcFBatch is given.
+    # initial_guess: 'interpolation' (segment starts linearly interpolated
+    #   between x0 and xd, or taken from a time-varying reference xd; u = ud)
+    #   or 'lqr' (the single rollout used by DiscreteTimeIterativeLQR).
+    # merit_weight: weight of the sum of |defects| added to the cost in the
+    #   line search. A step of length alpha reduces this term by
+    #   alpha*merit_weight*sum|d|, so steps that close the defects are
+    #   accepted unless they increase the cost by more than that.
+    # defect_tolerance: the iterations only stop on a small cost
+    #   reduction once max |defect| is below this.
+    # Only mode='ilqr' is supported; its own iteration loop has no ddp
+    #   terms.
+    # SolverStats.max_defect is max |defect| of the returned trajectory; it is
+    #   above defect_tolerance if the solve stopped before closing the
+    #   defects (e.g. at max_iterations).
+    def __init__(self, CalcF, n, m, num_segments, executor=None,
+                 batched_line_search='auto', initial_guess='interpolation',
+                 merit_weight=1e3, defect_tolerance=1e-6, max_iterations=20, **kwargs):
+        DiscreteTimeIterativeLQR.__init__(self, CalcF, n, m,
+                                          max_iterations=max_iterations, **kwargs)
+        if self.mode != 'ilqr':
+            raise ValueError("MultipleShootingIterativeLQR only supports mode='ilqr'.")
+        assert initial_guess in ('interpolation', 'lqr')
+        self.num_segments = num_segments
+        self.executor = executor
+        if batched_line_search == 'auto':
+            batched_line_search = not(kwargs.get('CalcFBatch') is None)
+        self.batched_line_search = batched_line_search
+        self.initial_guess = initial_guess
+        self.merit_weight = merit_weight
+        self.defect_tolerance = defect_tolerance
+
+    # first index of every segment, followed by N.
+    def CalcSegmentBounds(self, N):
+        S = min(self.num_segments, N)
+        return np.linspace(0, N, S+1).astype(int)
+
+    '''
+    Rolls out all segments from the start states x_start (S, n) with the
+    time step h. Returns x (N+1, n), u (N, m) and the defects d (N, n).
+    '''
+    def RollOutSegments(self, bounds, x_start, x, u, k, K, alpha, h):
+        S = bounds.size - 1
+        args = [(bounds[j], bounds[j+1]) for j in range(S)]
+        segment_args = ([self.CalcF]*S, [self.discretization]*S, [h]*S, list(x_start),
+                        [x[i0:i1+1] for i0, i1 in args], [u[i0:i1] for i0, i1 in args],
+                        [k[i0:i1] for i0, i1 in args], [K[i0:i1] for i0, i1 in args],
+                        [alpha]*S)
+        if self.executor is None:
+            segments = list(map(RollOutSegment, *segment_args))
+        else:
+            segments = list(self.executor.map(RollOutSegment, *segment_args))
+
+        x_new = np.zeros(x.shape)
+        u_new = np.zeros(u.shape)
+        d = np.zeros((u.shape[0], self.n))
+        for j, (x_seg, u_seg) in enumerate(segments):
+            i0, i1 = args[j]
+            x_new[i0:i1] = x_seg[0:-1]
+            u_new[i0:i1] = u_seg
+            if j == S-1:
+                x_new[i1] = x_seg[-1]
+            else:
+                d[i1-1] = x_seg[-1] - x_start[j+1]
+        return x_new, u_new, d
+
+    '''
+    RollOutGapScaled for all step lengths alphas (A,) at once, every time
+    step being one call of CalcNextStateBatch on the A states. Returns
+    x (A, N+1, n), u (A, N, m) and the new defects (A, N, n).
+    '''
+    def RollOutGapScaledBatch(self, bounds, x, u, d, k, K, alphas, h):
+        A = alphas.size
+        x_new = np.zeros((A,) + x.shape)
+        u_new = np.zeros((A,) + u.shape)
+        x_new[:, 0] = x[0]
+        segment_ends = set(bounds[1:-1])
+        for i in range(u.shape[0]):
+            if i in segment_ends:
+                x_new[:, i] -= (1-alphas)[:, None]*d[i-1]
+            u_new[:, i] = u[i] + alphas[:, None]*k[i] + (x_new[:, i] - x[i]).dot(K[i].T)
+            x_new[:, i+1] = self.discretization.CalcNextStateBatch(
+                self.CalcFBatch, x_new[:, i], u_new[:, i], h)
+        return x_new, u_new, (1-alphas)[:, None, None]*d
+
+    '''
+    Rollouts (x, u, d) of RollOutGapScaled for the step lengths alphas, in
+    order. All of them are rolled out at the first one, batched or mapped
+    over the executor; without either, every one is only rolled out when
+    it is requested.
+    '''
+    def RollOutLineSearch(self, bounds, x, u, d, k, K, alphas, h):
+        A = alphas.size
+        if self.batched_line_search:
+            x_new, u_new, d_new = self.RollOutGapScaledBatch(
+                bounds, x, u, d, k, K, alphas, h)
+            for a in range(A):
+                yield x_new[a], u_new[a], d_new[a]
+        elif not(self.executor is None):
+            for rollout in self.executor.map(
+                    RollOutGapScaled, [self.CalcF]*A, [self.discretization]*A, [h]*A,
+                    [bounds]*A, [x]*A, [u]*A, [d]*A, [k]*A, [K]*A, alphas):
+                yield rollout
+        else:
+            for alpha in alphas:
+                yield RollOutGapScaled(self.CalcF, self.discretization, h,
+                                       bounds, x, u, d, k, K, alpha)
+
+    # same as DiscreteTimeIterativeLQR.CalcDynamicsDerivatives, one segment
+    # per task on the executor unless a jacobian_cache or a batched
+    # derivative provider is used.
+    def CalcDynamicsDerivatives(self, x, u, context, x_next=None):
+        if self.executor is None or not(context.jacobian_cache is None) or \
+                not(self.derivatives is None):
+            return DiscreteTimeIterativeLQR.CalcDynamicsDerivatives(
+                self, x, u, context, x_next)
+        context.stats.num_jacobian_evaluations += u.shape[0]
+        bounds = self.CalcSegmentBounds(u.shape[0])
+        S = bounds.size - 1
+        h = context.traj_specs.h
+        if self.jacobian_structure is None:
+            CalcJacobian = jacobian
+        else:
+            CalcJacobian = self.jacobian_structure.CalcJacobian
+        segments = self.executor.map(
+            CalcSegmentJacobians, [self.CalcF]*S, [CalcJacobian]*S,
+            [self.discretization]*S, [h]*S,
+            [x[bounds[j]:bounds[j+1]] for j in range(S)],
+            [u[bounds[j]:bounds[j+1]] for j in range(S)])
+        fx_list, fu_list = zip(*segments)
+        return np.concatenate(fx_list), np.concatenate(fu_list)
+
+    def CalcMerit(self, x, u, d, t0, context):
+        return self.CalcJ(x, u, t0, context=context) + \
+            self.merit_weight*np.abs(d).sum()
+
+    # CalcTrajectory of DiscreteTimeIterativeLQR calls this with a new
+    # SolveContext.
+    def SolveTrajectory(self, context, t0, is_logging_trajectories):
+        traj_specs = context.traj_specs
+        stats = context.stats
+        h = traj_specs.h
+        N = traj_specs.N
+        bounds = self.CalcSegmentBounds(N)
+        S = bounds.size - 1
+        k = np.zeros((N, self.m))
+        K = np.zeros((N, self.m, self.n))
+        alphas = 0.5**np.arange(7) # step lengths of the line search
+
+        # initial guess
+        with stats.Time('lqr_init'):
+            if self.initial_guess == 'lqr':
+                x, u = self.CalcInitialTrajectory(traj_specs)
+                d = np.zeros((N, self.n))
+            else:
+                x = np.zeros((N+1, self.n))
+                u = np.zeros((N, self.m))
+                u[:] = traj_specs.ud
+                if traj_specs.xd.ndim == 2:
+                    x_start = traj_specs.xd[bounds[0:S]].copy()
+                    x_start[0] = traj_specs.x0
+                else:
+                    s = bounds[0:S]/float(N)
+                    x_start = traj_specs.x0 + s[:, None]*(traj_specs.xd - traj_specs.x0)
+                x, u, d = self.RollOutSegments(bounds, x_start, x, u, k, K, 0., h)
+        stats.num_dynamics_evaluations += N
+
+        max_iterations = self.max_iterations
+        J = np.zeros(max_iterations+1)
+        with stats.Time('cost_evaluation'):
+            merit = self.CalcMerit(x, u, d, t0, context)
+            J[0] = self.CalcJ(x, u, t0, context=context)
+        self.ReportIteration(context, 0, J[0], max_defect=np.abs(d).max())
+
+        if is_logging_trajectories:
+            x_log = x.reshape(1, N+1, self.n).copy()
+            u_log = u.reshape(1, N, self.m).copy()
+
+        j = 0 # iteration index
+        while True:
+            with stats.Time('cost_derivatives'):
+                lx, lu, lxx, luu = self.CalcCostDerivatives(x, u, t0, context)
+            with stats.Time('dynamics_derivatives'):
+                fx, fu = self.CalcDynamicsDerivatives(x, u, context, x[1:] + d)
+            with stats.Time('backward_pass'):
+                k, K, Vx, Vxx, delta_V = self.BackwardPass(
+                    fx, fu, lx[0:N], lu, lxx[0:N], luu, None, lx[N], lxx[N], d=d,
+                    **self.GetBackwardPassOptions(context))
+
+            # the defects shrink to (1-alpha)*d, and close for alpha = 1.
+            rollouts = self.RollOutLineSearch(bounds, x, u, d, k, K, alphas, h)
+            line_search_count = 0
+            while True:
+                with stats.Time('rollout'):
+                    x_next, u_next, d_next = next(rollouts)
+                with stats.Time('cost_evaluation'):
+                    merit_next = self.CalcMerit(x_next, u_next, d_next, t0, context)
+
+                if merit_next <= merit:
+                    break
+                elif line_search_count > 5:
+                    break
+                else:
+                    line_search_count += 1
+            rollouts.close()
+            if self.batched_line_search or not(self.executor is None):
+                stats.num_dynamics_evaluations += N*alphas.size
+            else:
+                stats.num_dynamics_evaluations += N*(line_search_count + 1)
+
+            stats.line_search_trials.append(line_search_count + 1)
+            merit_reduction = (merit - merit_next)/merit
+            if merit_next <= merit:
+                x, u, d, merit = x_next, u_next, d_next, merit_next
+            with stats.Time('cost_evaluation'):
+                J[j+1] = self.CalcJ(x, u, t0, context=context)
+            if is_logging_trajectories:
+                x_log = np.append(x_log, x.reshape(1, N+1, self.n), axis=0)
+                u_log = np.append(u_log, u.reshape(1, N, self.m), axis=0)
+
+            self.ReportIteration(context, j+1, J[j+1], line_search_count + 1,
+                                 max_defect=np.abs(d).max())
+            j += 1
+            is_feasible = np.abs(d).max() < self.defect_tolerance
+            if j >= max_iterations or line_search_count > 5 or \
+                    (merit_reduction < 0.01 and is_feasible):
+                break
+        stats.max_defect = np.abs(d).max()
+
+        if is_logging_trajectories:
+            return x_log, u_log, J[0:j+1], traj_specs.QN, Vx, Vxx, k, K
+        else:
+            return x, u, J[0:j+1], traj_specs.QN, Vx, Vxx, k, K
@@ -2,14 +2,12 @@ import numpy as np
 from numpy import sin, cos
 from numpy import linalg as LA
 from pydrake.forwarddiff import jacobian
-from pydrake.all import LinearQuadraticRegulator
+from pydrake.systems.controllers import LinearQuadraticRegulator
 from pydrake.systems.framework import VectorSystem
-import matplotlib.pyplot as plt
-# for meshcat
+from sparsity import JacobianStructure
 import time
-import meshcat
-import meshcat.geometry as geometry
-import meshcat.transformations as tf
+# matplotlib and meshcat are only imported by the plotting functions, so
+# that the dynamics can be imported headless.
 
 '''
 x = [q, q_dot]
@@ -142,6 +140,8 @@ def CalcPhiD(rpy):
 # t is a 1D numpy array of time. The quadrotor has state x[i] at time t[i].
 # wpts has shape (N, 3), where wpts[i] is the Cartesian coordinate of waypoint i.
 def PlotTrajectoryMeshcat(x, t, vis, wpts_list = None):
+    import meshcat.geometry as geometry
+    import meshcat.transformations as tf
     # initialize
     vis.delete()
 
@@ -245,7 +245,88 @@ def CalcF(x_u):
     xdot[9:12] = rpy_dd
     return xdot
 
+
+'''
+Same dynamics as CalcF, evaluated for a batch of B states and inputs at once.
+x: (B, n) float array, u: (B, m) float array. Complex arrays are
+supported too (for complex-step differentiation).
+Returns xdot: (B, n).
+'''
+def CalcFBatch(x, u):
+    B = x.shape[0]
+    dtype = np.result_type(x, u)
+    I_inv = LA.inv(I)
+    uF = kF * u
+    uM = kM * u
+    M = np.empty((B, 3), dtype=dtype)
+    M[:,0] = l*(-uF[:,0] - uF[:,1] + uF[:,2] + uF[:,3])
+    M[:,1] = l*(-uF[:,0] - uF[:,3] + uF[:,1] + uF[:,2])
+    M[:,2] = - uM[:,0] + uM[:,1] - uM[:,2] + uM[:,3]
+
+    rpy_d = x[:, 9:12]
+    sr = sin(x[:,3])
+    cr = cos(x[:,3])
+    sp = sin(x[:,4])
+    cp = cos(x[:,4])
+    sy = sin(x[:,5])
+    cy = cos(x[:,5])
+    cp2 = cp**2
+    tp = sp/cp
+
+    # translational acceleration in world frame: R_WB[:,2]*F_z + Fg.
+    F = uF.sum(axis=1)
+    xyz_dd = np.empty((B, 3), dtype=dtype)
+    xyz_dd[:,0] = (cy*sp*cr + sy*sr)*F/mass
+    xyz_dd[:,1] = (sy*sp*cr - cy*sr)*F/mass
+    xyz_dd[:,2] = cp*cr*F/mass - g
+
+    # pqr = Phi_inv * rpy_d
+    pqr = np.empty((B, 3), dtype=dtype)
+    pqr[:,0] = rpy_d[:,0] - sp*rpy_d[:,2]
+    pqr[:,1] = cr*rpy_d[:,1] + sr*cp*rpy_d[:,2]
+    pqr[:,2] = -sr*rpy_d[:,1] + cr*cp*rpy_d[:,2]
+    pqr_d = (M - np.cross(pqr, pqr.dot(I.T))).dot(I_inv.T)
+
+    Phi = np.zeros((B, 3, 3), dtype=dtype)
+    Phi[:,0,0] = 1
+    Phi[:,0,1] = sr*tp
+    Phi[:,0,2] = cr*tp
+    Phi[:,1,1] = cr
+    Phi[:,1,2] = -sr
+    Phi[:,2,1] = sr/cp
+    Phi[:,2,2] = cr/cp
+
+    # Phi_d_rpy_d[:,i,j] = sum_k Phi_d[:,i,j,k] * rpy_d[:,k], see CalcPhiD.
+    Phi_d_rpy_d = np.zeros((B, 3, 3), dtype=dtype)
+    Phi_d_rpy_d[:,0,1] = cr*tp*rpy_d[:,0] + sr/cp2*rpy_d[:,1]
+    Phi_d_rpy_d[:,0,2] = -sr*tp*rpy_d[:,0] + cr/cp2*rpy_d[:,1]
+    Phi_d_rpy_d[:,1,1] = -sr*rpy_d[:,0]
+    Phi_d_rpy_d[:,1,2] = -cr*rpy_d[:,0]
+    Phi_d_rpy_d[:,2,1] = cr/cp*rpy_d[:,0] + sr*sp/cp2*rpy_d[:,1]
+    Phi_d_rpy_d[:,2,2] = -sr/cp*rpy_d[:,0] + cr*sp/cp2*rpy_d[:,1]
+
+    rpy_dd = np.einsum('bij,bj->bi', Phi, pqr_d) + \
+        np.einsum('bij,bj->bi', Phi_d_rpy_d, pqr)
+
+    xdot = np.empty((B, n), dtype=dtype)
+    xdot[:, 0:6] = x[:, 6:12]
+    xdot[:, 6:9] = xyz_dd
+    xdot[:, 9:12] = rpy_dd
+    return xdot
+
+
+'''
+Structure of [A, B] = d CalcF/d(x, u): rows 0:6 (xdot[0:6] = x[6:12]) are
+constant, and positions and linear velocities do not enter rows 6:12.
+'''
+f_x_u_const = np.zeros((n, n+m))
+f_x_u_const[0:6, 6:12] = np.eye(6)
+jacobian_structure = JacobianStructure(
+    n, m, np.arange(6, 12), np.hstack((np.arange(3, 6), np.arange(9, n+m))),
+    f_x_u_const)
+
 def PlotTraj(x, dt = None, xw_list = None, t = None):
+    import matplotlib.pyplot as plt
     x = x.copy() # removes reference to input variable.
     # add one dimension to x if x is 2D.
     if len(x.shape) == 2:
@@ -294,6 +375,7 @@ def PlotTraj(x, dt = None, xw_list = None, t = None):
         ax_yaw.plot(t, x[j,:,5])
 
     # plot waypoints
+    # (a list of WayPoints or an iLQR.WayPointSet, which iterates over them.)
     if not(xw_list is None):
         for xw in xw_list:
             ax_x.plot(xw.t, xw.x[0], 'r*')
@@ -346,6 +428,7 @@ class Quadrotor(VectorSystem):
 
 
 if __name__ == '__main__':
+    from simulator import Simulate
     # simulate quadrotor w/ LQR controller using forward Euler integration.
     # fixed point
     xd = np.zeros(n)
@@ -364,22 +447,15 @@ if __name__ == '__main__':
 
     # simulate stabilizing about fixed point using LQR controller
     dt = 0.001
-    N = int(4.0/dt)
-    x = np.zeros((N+1, n))
-
     x0 = np.zeros(n)
-    x[0] = x0
-
-    timeVec = np.zeros(N+1)
-
-    for i in range(N):
-        x_u = np.hstack((x[i], -K0.dot(x[i]-xd) + ud))
-        x[i+1] = x[i] + dt*CalcF(x_u)
-        timeVec[i] = timeVec[i-1] + dt
+    log = Simulate(CalcF, lambda x, t: -K0.dot(x-xd) + ud, x0, 4.0, dt)
+    x = log.data().T
+    timeVec = log.sample_times()
 
     #PlotTraj(x.copy(), dt)
 
     #%% open meshact
+    import meshcat
     vis = meshcat.Visualizer()
     vis.open
 
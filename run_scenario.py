@@ -0,0 +1,145 @@
+import argparse
+import time
+t_process_start = time.perf_counter()
+import json
+import os
+import sys
+from scenarios import scenarios, ParseOption
+from solver_stats import SummarizeStats, FormatSummary
+t_imported = time.perf_counter()
+
+'''
+Headless command-line runner of the scenarios of scenarios.py, e.g.
+    python run_scenario.py quadrotor_3d pendulum --repeats 3
+    python run_scenario.py quadrotor_3d --N 400 --option discretization='"rk4"'
+    python run_scenario.py quadrotor_3d --plot --meshcat
+    python run_scenario.py scenario_configs/quadrotor_3d.json
+Scenario files (.json, .yaml, .yml, see scenario_config.py) can be given
+in place of names; they are solved with their own horizon (--N is rejected
+for them, as their references and waypoint times depend on it) and planner
+options, and an invalid file stops the runner with its error message.
+Solves every scenario repeats times and reports the import time, the
+solve times and iterations, and the per-phase breakdown of SolverStats;
+--json writes the results to a file and --store appends every solution
+to a trajectory_store.TrajectoryStore per scenario. Nothing is plotted and matplotlib and
+meshcat are not imported unless --plot or --meshcat is given. --log
+prints the solver's iteration log.
+'''
+
+
+# solves traj_specs repeats times; returns the last result and all SolverStats.
+def RunScenario(traj_specs, planner, repeats):
+    stats_list = []
+    for r in range(repeats):
+        result = planner.CalcTrajectory(traj_specs, is_logging_trajectories=False,
+                                        is_returning_stats=True)
+        stats_list.append(result[-1])
+    return result, stats_list
+
+
+def IsScenarioFile(name):
+    return os.path.splitext(name)[1] in ('.json', '.yaml', '.yml')
+
+
+# states and inputs of a solution over time; imports matplotlib.
+def PlotSolution(name, x, u, h):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    t = h*np.arange(x.shape[0])
+    fig = plt.figure(figsize=(8, 6), dpi=100)
+    fig.suptitle(name)
+    ax_x = fig.add_subplot(211)
+    ax_x.plot(t, x)
+    ax_x.set_ylabel('x')
+    ax_u = fig.add_subplot(212)
+    ax_u.plot(t[0:-1], u)
+    ax_u.set_ylabel('u')
+    ax_u.set_xlabel('time(s)')
+
+
+# animates a quadrotor_3d solution in meshcat; imports meshcat.
+def ShowMeshcat(traj_specs, x):
+    import meshcat
+    import numpy as np
+    from quadrotor3D import PlotTrajectoryMeshcat
+    vis = meshcat.Visualizer()
+    vis.open()
+    wpts_list = None
+    if not(traj_specs.xw_list is None):
+        wpts_list = traj_specs.xw_list.x[:, 0:3]
+    PlotTrajectoryMeshcat(x, traj_specs.h*np.arange(x.shape[0]), vis, wpts_list)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run iLQR scenarios headless.')
+    parser.add_argument('scenarios', nargs='*', default=['quadrotor_3d'],
+                        help='scenario files or any of: ' + ', '.join(scenarios))
+    parser.add_argument('--N', type=int, help='horizon (default: the scenario\'s)')
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--option', action='append', default=[],
+                        help='planner option key=value, e.g. max_iterations=20')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--store', help='append the solutions to trajectory stores '
+                        'in this directory, one per scenario')
+    parser.add_argument('--plot', action='store_true')
+    parser.add_argument('--meshcat', action='store_true',
+                        help='animate quadrotor_3d solutions in meshcat')
+    parser.add_argument('--log', action='store_true', help='print the solver log')
+    args = parser.parse_args()
+    scenario_configs = {}
+    for name in args.scenarios:
+        if IsScenarioFile(name):
+            from scenario_config import LoadScenarioConfig
+            try:
+                scenario_configs[name] = LoadScenarioConfig(name)
+            except (ValueError, OSError) as error:
+                parser.error(str(error))
+            if not(args.N is None):
+                parser.error("--N does not apply to the scenario file %s, whose "
+                             "horizon is its N" % name)
+        elif not(name in scenarios):
+            parser.error("unknown scenario %s, choose from %s" %
+                         (name, ', '.join(scenarios)))
+    if args.log:
+        from solver_log import EnableLogging
+        EnableLogging()
+
+    planner_options = dict(ParseOption(option) for option in args.option)
+    print("import time: %.1f ms" % (1e3*(t_imported - t_process_start)))
+    results = {}
+    for argument in args.scenarios:
+        if argument in scenario_configs:
+            scenario_config = scenario_configs[argument]
+            name, model = scenario_config.name, scenario_config.model
+            traj_specs = scenario_config.traj_specs
+            planner = scenario_config.MakePlanner(**planner_options)
+        else:
+            name, model = argument, argument
+            scenario = scenarios[name]
+            traj_specs = scenario.MakeTrajSpecs(scenario.N if args.N is None else args.N)
+            planner = scenario.MakePlanner(**planner_options)
+        result, stats_list = RunScenario(traj_specs, planner, args.repeats)
+        x, u, J = result[0], result[1], result[2]
+        print("\n%s: N = %d, J = %.10g" % (name, traj_specs.N, J[-1]))
+        summary = SummarizeStats(stats_list)
+        print(FormatSummary(summary))
+        results[name] = {'N': traj_specs.N,
+                         'final_cost': float(J[-1]),
+                         'stats': [stats.AsDict() for stats in stats_list],
+                         'summary': summary}
+        if not(args.store is None):
+            from trajectory_store import TrajectoryStore
+            with TrajectoryStore(os.path.join(args.store, name), 'a') as store:
+                store.AppendSolution(x, u, result[6], result[7], result[4], result[5])
+        if args.plot:
+            PlotSolution(name, x, u, traj_specs.h)
+        if args.meshcat and model == 'quadrotor_3d':
+            ShowMeshcat(traj_specs, x)
+
+    if not(args.json is None):
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1, default=float)
+    if args.plot:
+        import matplotlib.pyplot as plt
+        plt.show()
+    sys.exit(0)
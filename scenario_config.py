@@ -0,0 +1,351 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from iLQR import DiscreteTimeIterativeLQR, WayPoint, TrajectorySpecs
+from scenarios import scenarios
+
+'''
+Declarative scenario files that map onto TrajectorySpecs and WayPoint, and a
+batch executor for directories of them.
+
+A scenario file is JSON (or YAML, if PyYAML is installed), e.g.
+    {
+     "name": "quadrotor_3d_high_waypoint",
+     "model": "quadrotor_3d",
+     "h": 0.01, "N": 200,
+     "x0": [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+     "u0": [1.25, 1.25, 1.25, 1.25],
+     "xd": [2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+     "Q": [1, 1, 1, 1, 1, 1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1],
+     "R": 1,
+     "QN": [1000, 1000, 1000, 100, 100, 100, 10, 10, 10, 10, 10, 10],
+     "waypoints": [{"x": [1, 0.2, 0.5, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                    "t": 0.6, "W": [50, 50, 5, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                    "rho": 5}],
+     "planner": {"max_iterations": 20}
+    }
+model: the dynamics, a key of scenarios.scenarios (its CalcF, n, m and
+    planner options, which "planner" extends).
+name: defaults to the file name without extension.
+u0, ud: default to ud and to zeros. xd (ud) is a vector or a time-varying
+    (N+1, n) ((N, m)) reference.
+Q, R, QN, W: a scalar (times identity), a vector (the diagonal) or a
+    matrix; Q and R may also be time-varying, (N, n, n) and (N, m, m).
+    QN is optional (the LQR cost-to-go of the goal by default).
+waypoints: optional; t is absolute (s), within [0, N*h], and rho > 0.
+planner: optional keyword arguments of DiscreteTimeIterativeLQR.
+Files are validated and converted once by LoadScenarioConfig, which raises
+a ValueError "<file>: <key>: ..." for any missing, misshaped or out of range
+entry, before any of them reaches the asserts of TrajectorySpecs and
+WayPoint.
+
+RunBatch solves a list of ScenarioConfigs on a ProcessPoolExecutor and
+WriteColumns stores one row per scenario in a compressed .npz file with one
+array per column (see columns), e.g.
+    python scenario_config.py export scenario_configs
+    python scenario_config.py run scenario_configs --output results.npz
+'''
+
+# names of the options a file's "planner" mapping may set.
+planner_option_names = tuple(
+    inspect.signature(DiscreteTimeIterativeLQR.__init__).parameters)[4:]
+
+columns = ('name', 'model', 'N', 'h', 'iterations', 'final_cost',
+           'terminal_error', 'solve_time', 'status')
+
+
+class ScenarioConfig:
+    # model: key of scenarios.scenarios.
+    # traj_specs: TrajectorySpecs of the file.
+    # planner_options: the file's "planner" entries.
+    def __init__(self, name, model, traj_specs, planner_options=None):
+        self.name = name
+        self.model = model
+        self.traj_specs = traj_specs
+        self.planner_options = {} if planner_options is None else planner_options
+
+    # planner for this scenario; kwargs override planner_options.
+    def MakePlanner(self, **kwargs):
+        options = dict(self.planner_options)
+        options.update(kwargs)
+        return scenarios[self.model].MakePlanner(**options)
+
+
+# finite float array of value; source and key only name the entry in errors.
+def ParseArray(value, source, key):
+    try:
+        a = np.array(value, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("%s: %s: not a number or a rectangular array of numbers"
+                         % (source, key))
+    if not(np.isfinite(a).all()):
+        raise ValueError("%s: %s: not finite" % (source, key))
+    return a
+
+
+# float in [lower, upper] (> lower if is_strict); None is unbounded.
+def ParseScalar(value, source, key, lower=None, upper=None, is_strict=False):
+    a = ParseArray(value, source, key)
+    if a.ndim != 0:
+        raise ValueError("%s: %s: expected a number, got shape %s" % (source, key, a.shape))
+    v = float(a)
+    if not(lower is None) and (v < lower or (is_strict and v == lower)):
+        raise ValueError("%s: %s: %g must be %s %g" % (
+            source, key, v, '>' if is_strict else '>=', lower))
+    if not(upper is None) and v > upper:
+        raise ValueError("%s: %s: %g must be <= %g" % (source, key, v, upper))
+    return v
+
+
+'''
+Weight matrix (k, k) from a scalar, a diagonal or a matrix, or (N, k, k)
+if N is given. source and key only name the entry in errors.
+'''
+def ParseWeight(value, k, source, key, N=None):
+    W = ParseArray(value, source, key)
+    if W.ndim == 0:
+        return W*np.eye(k)
+    if W.ndim == 1 and W.shape == (k,):
+        return np.diag(W)
+    if W.shape == (k, k) or (not(N is None) and W.shape == (N, k, k)):
+        return W
+    raise ValueError("%s: %s: shape %s, expected a scalar, (%d,) or (%d, %d)%s"
+                     % (source, key, W.shape, k, k, k,
+                        "" if N is None else " or (%d, %d, %d)" % (N, k, k)))
+
+
+# vector (size,) or, if num_knots is given, optionally (num_knots, size).
+def ParseVector(value, size, source, key, num_knots=None):
+    v = ParseArray(value, source, key)
+    if v.shape == (size,) or (not(num_knots is None) and v.shape == (num_knots, size)):
+        return v
+    raise ValueError("%s: %s: shape %s, expected (%d,)%s" % (
+        source, key, v.shape, size,
+        "" if num_knots is None else " or (%d, %d)" % (num_knots, size)))
+
+
+'''
+Validates a scenario dict (the contents of a file) and converts it to a
+ScenarioConfig. source names the dict in errors, e.g. its path.
+'''
+def MakeScenarioConfig(config, name=None, source='scenario'):
+    if not(isinstance(config, dict)):
+        raise ValueError("%s: expected a mapping of keys to values" % source)
+    for key in ('model', 'h', 'N', 'x0', 'xd', 'Q', 'R'):
+        if not(key in config):
+            raise ValueError("%s: missing %s" % (source, key))
+    model = config['model']
+    if not(model in scenarios):
+        raise ValueError("%s: unknown model %s, choose from %s" % (
+            source, model, ', '.join(scenarios)))
+    n = scenarios[model].n
+    m = scenarios[model].m
+    h = ParseScalar(config['h'], source, 'h', 0., is_strict=True)
+    N = ParseScalar(config['N'], source, 'N', 1.)
+    if N != int(N):
+        raise ValueError("%s: N: %g is not an integer" % (source, N))
+    N = int(N)
+
+    x0 = ParseVector(config['x0'], n, source, 'x0')
+    xd = ParseVector(config['xd'], n, source, 'xd', N+1)
+    ud = ParseVector(config.get('ud', np.zeros(m)), m, source, 'ud', N)
+    u0 = ParseVector(config.get('u0', ud if ud.ndim == 1 else ud[0]), m, source, 'u0')
+    Q = ParseWeight(config['Q'], n, source, 'Q', N)
+    R = ParseWeight(config['R'], m, source, 'R', N)
+    QN = None
+    if not(config.get('QN') is None):
+        QN = ParseWeight(config['QN'], n, source, 'QN')
+
+    if not(isinstance(config.get('waypoints', []), list)):
+        raise ValueError("%s: waypoints: expected a list" % source)
+    if not(isinstance(config.get('planner', {}), dict)):
+        raise ValueError("%s: planner: expected a mapping of options" % source)
+    for option in config.get('planner', {}):
+        if not(option in planner_option_names):
+            raise ValueError("%s: planner: unknown option %s, choose from %s" % (
+                source, option, ', '.join(planner_option_names)))
+    xw_list = []
+    for j, waypoint in enumerate(config.get('waypoints', [])):
+        key = 'waypoints[%d]' % j
+        if not(isinstance(waypoint, dict)):
+            raise ValueError("%s: %s: expected a mapping with x, t, W, rho" % (source, key))
+        for entry in ('x', 't', 'W', 'rho'):
+            if not(entry in waypoint):
+                raise ValueError("%s: missing %s.%s" % (source, key, entry))
+        xw_list.append(WayPoint(ParseVector(waypoint['x'], n, source, key + '.x'),
+                                ParseScalar(waypoint['t'], source, key + '.t', 0., N*h),
+                                ParseWeight(waypoint['W'], n, source, key + '.W'),
+                                ParseScalar(waypoint['rho'], source, key + '.rho', 0.,
+                                            is_strict=True)))
+
+    traj_specs = TrajectorySpecs(x0, u0, xd, ud, h, N, Q, R, QN, xw_list)
+    planner_options = dict(config.get('planner', {}))
+    return ScenarioConfig(config.get('name', name), model, traj_specs, planner_options)
+
+
+# ScenarioConfig of a file; a ValueError names the file if it cannot be parsed.
+def LoadScenarioConfig(path):
+    with open(path) as f:
+        if path.endswith('.yaml') or path.endswith('.yml'):
+            import yaml # optional, only for YAML files.
+            try:
+                config = yaml.safe_load(f)
+            except yaml.YAMLError as error:
+                raise ValueError("%s: %s" % (path, error))
+        else:
+            try:
+                config = json.load(f)
+            except ValueError as error:
+                raise ValueError("%s: %s" % (path, error))
+    name = os.path.splitext(os.path.basename(path))[0]
+    return MakeScenarioConfig(config, name, path)
+
+
+# ScenarioConfigs of all scenario files of a directory, sorted by file name.
+def LoadScenarioDirectory(directory):
+    paths = sorted(os.path.join(directory, file_name)
+                   for file_name in os.listdir(directory)
+                   if os.path.splitext(file_name)[1] in ('.json', '.yaml', '.yml'))
+    return [LoadScenarioConfig(path) for path in paths]
+
+
+# weight as written by ConfigFromSpecs: its diagonal if it is diagonal.
+def WeightToConfig(W):
+    W = np.asarray(W)
+    if W.ndim == 2 and np.array_equal(W, np.diag(np.diag(W))):
+        return np.diag(W).tolist()
+    return W.tolist()
+
+
+# scenario dict (for a file) of traj_specs with the dynamics of model.
+def ConfigFromSpecs(name, model, traj_specs, planner_options=None):
+    config = {'name': name,
+              'model': model,
+              'h': traj_specs.h,
+              'N': traj_specs.N,
+              'x0': np.asarray(traj_specs.x0).tolist(),
+              'u0': np.asarray(traj_specs.u0).tolist(),
+              'xd': traj_specs.xd.tolist(),
+              'ud': traj_specs.ud.tolist(),
+              'Q': WeightToConfig(traj_specs.Q),
+              'R': WeightToConfig(traj_specs.R)}
+    if not(traj_specs.QN is None):
+        config['QN'] = WeightToConfig(traj_specs.QN)
+    if not(traj_specs.xw_list is None):
+        config['waypoints'] = [{'x': xw.x.tolist(), 't': float(xw.t),
+                                'W': WeightToConfig(xw.W), 'rho': float(xw.rho)}
+                               for xw in traj_specs.xw_list]
+    if not(planner_options is None) and len(planner_options) > 0:
+        config['planner'] = dict(planner_options)
+    return config
+
+
+# writes a scenario dict as JSON with one key per line.
+def WriteScenarioFile(f, config):
+    f.write("{\n" + ",\n".join(" %s: %s" % (json.dumps(key), json.dumps(value))
+                                for key, value in config.items()) + "\n}\n")
+
+
+# writes the scenarios of scenarios.py, with their own horizons, as files.
+def ExportScenarios(directory, names=None):
+    if not(os.path.isdir(directory)):
+        os.makedirs(directory)
+    for name in (list(scenarios) if names is None else names):
+        scenario = scenarios[name]
+        config = ConfigFromSpecs(name, name, scenario.MakeTrajSpecs(scenario.N))
+        with open(os.path.join(directory, name + '.json'), 'w') as f:
+            WriteScenarioFile(f, config)
+
+
+# solves one ScenarioConfig; returns its row of the batch results.
+def RunConfig(scenario_config):
+    traj_specs = scenario_config.traj_specs
+    row = {'name': scenario_config.name,
+           'model': scenario_config.model,
+           'N': traj_specs.N,
+           'h': traj_specs.h,
+           'iterations': -1,
+           'final_cost': np.nan,
+           'terminal_error': np.nan,
+           'solve_time': np.nan,
+           'status': 'ok'}
+    try:
+        planner = scenario_config.MakePlanner()
+        x, u, J, k, K, stats = planner.CalcTrajectory(
+            traj_specs, is_returning_stats=True, outputs='policy')
+    except Exception as error:
+        row['status'] = 'failed: %s' % error
+        return row
+    row['iterations'] = stats.num_iterations
+    row['final_cost'] = float(J[-1])
+    row['terminal_error'] = float(np.linalg.norm(x[-1] - traj_specs.xg))
+    row['solve_time'] = stats.total_time
+    return row
+
+
+'''
+Solves all scenario_configs in parallel, on executor or on a new
+ProcessPoolExecutor with max_workers processes (max_workers=1 solves them
+serially in this process). Returns the rows in the order of
+scenario_configs; a scenario whose solve raises gets status 'failed: ...'
+instead of stopping the batch.
+'''
+def RunBatch(scenario_configs, max_workers=None, executor=None):
+    if executor is None and max_workers == 1:
+        return [RunConfig(scenario_config) for scenario_config in scenario_configs]
+    if executor is None:
+        with ProcessPoolExecutor(max_workers) as executor:
+            return list(executor.map(RunConfig, scenario_configs))
+    return list(executor.map(RunConfig, scenario_configs))
+
+
+# writes rows (dicts with all columns) to a compressed .npz, one array per column.
+def WriteColumns(path, rows):
+    arrays = {column: np.array([row[column] for row in rows]) for column in columns}
+    arrays['name'] = arrays['name'].astype(str)
+    arrays['model'] = arrays['model'].astype(str)
+    arrays['status'] = arrays['status'].astype(str)
+    np.savez_compressed(path, **arrays)
+
+
+# {column: array} of a file written by WriteColumns.
+def ReadColumns(path):
+    with np.load(path) as data:
+        return {column: data[column] for column in data.files}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scenario files of iLQR problems.')
+    subparsers = parser.add_subparsers(dest='command')
+    parser_run = subparsers.add_parser('run', help='solve a directory of scenarios')
+    parser_run.add_argument('directory')
+    parser_run.add_argument('--output', default='batch_results.npz')
+    parser_run.add_argument('--workers', type=int, help='processes (default: all cores)')
+    parser_export = subparsers.add_parser(
+        'export', help='write the scenarios of scenarios.py as files')
+    parser_export.add_argument('directory')
+    parser_export.add_argument('--scenarios', nargs='+', choices=list(scenarios))
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        ExportScenarios(args.directory, args.scenarios)
+    elif args.command == 'run':
+        try:
+            scenario_configs = LoadScenarioDirectory(args.directory)
+        except (ValueError, OSError) as error:
+            sys.exit(str(error))
+        t_start = time.perf_counter()
+        rows = RunBatch(scenario_configs, args.workers)
+        WriteColumns(args.output, rows)
+        for row in rows:
+            print("%30s %6d %4d %14.8g %10.2e %10.2f  %s" % (
+                row['name'], row['N'], row['iterations'], row['final_cost'],
+                row['terminal_error'], 1e3*row['solve_time'], row['status']))
+        print("%d scenarios in %.2f s" % (len(rows), time.perf_counter() - t_start))
+    else:
+        parser.print_help()
@@ -0,0 +1,172 @@
+import json
+import numpy as np
+from numpy import sin, cos
+from iLQR import DiscreteTimeIterativeLQR, WayPoint, TrajectorySpecs
+import quadrotor3D
+
+'''
+Catalogue of the example problems, importable without running or plotting
+anything, for benchmarks and regression harnesses.
+
+Every Scenario has the dynamics of one of the example scripts and builds
+the TrajectorySpecs of that script for any horizon N (waypoint times scale
+with the horizon, as in the scripts):
+    pendulum: swing-up (ilqr_pendulum.py),
+    cart_pole: swing-up (ilqr_cart_pole.py),
+    quadrotor_2d: planar quadrotor (ilqr_quadrotor.py),
+    double_integrator: linear, with a waypoint (ilqr_double_integrator.py),
+    quadrotor_3d: 3D quadrotor with a waypoint (ilqr_quadrotor_3D.py).
+The example scripts take their problems from here and only solve, simulate
+or plot under __main__, so importing any of them has no side effects.
+'''
+
+
+def CalcFPendulum(x_u):
+    assert(x_u.size == 3)
+    theta = x_u[0]
+    theta_dot = x_u[1]
+    u = x_u[2]
+    return np.array([theta_dot, u - sin(theta)])
+
+
+def CalcFCartPole(x_u):
+    assert(x_u.size == 5)
+    x = x_u[0:4]
+    u = x_u[4:5]
+    theta = x[1]
+    xc_dot = x[2]
+    theta_dot = x[3]
+
+    xc_dotdot = u[0] + theta_dot**2*sin(theta) + sin(theta)*cos(theta)
+    xc_dotdot /= 1+sin(theta)**2
+    theta_dotdot = -cos(theta)*u[0] - -theta_dot**2*sin(2*theta)/2 - 2*sin(theta)
+    theta_dotdot /= 1+sin(theta)**2
+    return np.array([xc_dot, theta_dot, xc_dotdot, theta_dotdot])
+
+
+# planar quadrotor, q = [x, y, theta], x = [q, q_dot]; m, l, g, I = 1.
+def CalcFQuadrotor2D(x_u):
+    assert(x_u.size == 8)
+    x = x_u[0:6]
+    u = x_u[6:8]
+    theta = x[2]
+    return np.array([x[3], x[4], x[5],
+                     -sin(theta) * (u[0] + u[1]),
+                     cos(theta) * (u[0] + u[1]) - 1,
+                     u[1] - u[0]])
+
+
+def CalcFDoubleIntegrator(x_u):
+    assert(x_u.size == 3)
+    return np.array([x_u[1], x_u[2]])
+
+
+# the goal, weights and initial state of ilqr_pendulum.py.
+def MakePendulumSpecs(N=400, h=0.01):
+    QN = 100*np.diag([1., 1])
+    return TrajectorySpecs(np.array([0., 0.1]), np.zeros(1), np.array([-np.pi, 0.]),
+                           np.zeros(1), h, N, QN, np.eye(1), QN)
+
+
+def MakeCartPoleSpecs(N=400, h=0.01):
+    QN = 100*np.eye(4)
+    return TrajectorySpecs(np.zeros(4), np.zeros(1), np.array([0, np.pi, 0, 0]),
+                           np.zeros(1), h, N, 100*np.eye(4), np.eye(1), QN)
+
+
+def MakeQuadrotor2DSpecs(N=600, h=0.01):
+    u0 = np.array([0.5, 0.5])
+    QN = np.diag([100, 10, 10, 0.1, 0.1, 10])
+    return TrajectorySpecs(np.zeros(6), u0, np.array([1., 0, 0, 0, 0, 0]), u0,
+                           h, N, 0.01*np.eye(6), np.eye(2), QN)
+
+
+def MakeDoubleIntegratorSpecs(N=300, h=0.01):
+    xw = WayPoint(np.array([0.3, 0.2]), h*N*0.4, 10*np.eye(2), 100)
+    return TrajectorySpecs(np.array([0., 0]), np.zeros(1), np.array([1., 0]),
+                           np.zeros(1), h, N, np.diag([0.1, 0.1]), 0.1*np.eye(1),
+                           100*np.diag([1, 0.1]), [xw])
+
+
+def MakeQuadrotor3DSpecs(N=200, h=0.01):
+    n = quadrotor3D.n
+    u0 = np.zeros(quadrotor3D.m)
+    u0[:] = quadrotor3D.mass * quadrotor3D.g / 4
+    xd = np.zeros(n)
+    xd[0:2] = [2, 1]
+    QN = 100*np.diag([10, 10, 10, 1, 1, 1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])
+    Q_vec = np.ones(n)
+    Q_vec[6:12] *= 0.1
+    x1 = np.zeros(n)
+    x1[0:2] = [1, 0.2]
+    W1_vec = np.zeros(n)
+    W1_vec[0:2] = 1
+    W1_vec[2] = 0.1
+    xw = WayPoint(x1, h*N*0.3, 50*np.diag(W1_vec), 5)
+    return TrajectorySpecs(np.zeros(n), u0, xd, u0, h, N, np.diag(Q_vec),
+                           np.eye(quadrotor3D.m), QN, xw_list=[xw])
+
+
+# horizon and waypoint of each MPC solve of
+# quadrotor_iterative_LQR_MPC_simulation.py; the waypoint time is absolute.
+def MakeQuadrotor3DMpcSpecs(N=100, h=0.01):
+    n = quadrotor3D.n
+    u0 = np.zeros(quadrotor3D.m)
+    u0[:] = quadrotor3D.mass * quadrotor3D.g / 4
+    xd = np.zeros(n)
+    xd[0:3] = [2., 1, 1]
+    QN = 100*np.diag([10, 10, 10, 1, 1, 1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])
+    Q_vec = np.ones(n)
+    Q_vec[6:12] *= 0.1
+    x1 = np.zeros(n)
+    x1[0:3] = [1, 0, 0.5]
+    W1_vec = np.zeros(n)
+    W1_vec[0:2] = 1
+    W1_vec[2] = 0.1
+    xw = WayPoint(x1, 1.0, 10*np.diag(W1_vec), 5)
+    return TrajectorySpecs(np.zeros(n), u0, xd, u0, h, N, np.diag(Q_vec),
+                           np.eye(quadrotor3D.m), QN, xw_list=[xw])
+
+
+# planner option "key=value" of a command line -> (key, value), where value
+# is parsed as JSON if possible.
+def ParseOption(option):
+    key, value = option.split('=', 1)
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+class Scenario:
+    # MakeTrajSpecs(N, h): TrajectorySpecs of the scenario with horizon N.
+    # N: horizon of the example script.
+    # planner_options: keyword arguments of DiscreteTimeIterativeLQR.
+    def __init__(self, name, CalcF, n, m, MakeTrajSpecs, N, planner_options=None):
+        self.name = name
+        self.CalcF = CalcF
+        self.n = n
+        self.m = m
+        self.MakeTrajSpecs = MakeTrajSpecs
+        self.N = N
+        self.planner_options = {} if planner_options is None else planner_options
+
+    # planner for this scenario; kwargs override planner_options.
+    def MakePlanner(self, planner_class=DiscreteTimeIterativeLQR, **kwargs):
+        options = dict(self.planner_options)
+        options.update(kwargs)
+        return planner_class(self.CalcF, self.n, self.m, **options)
+
+
+scenarios = {
+    'pendulum': Scenario('pendulum', CalcFPendulum, 2, 1, MakePendulumSpecs, 400),
+    'cart_pole': Scenario('cart_pole', CalcFCartPole, 4, 1, MakeCartPoleSpecs, 400),
+    'quadrotor_2d': Scenario('quadrotor_2d', CalcFQuadrotor2D, 6, 2,
+                             MakeQuadrotor2DSpecs, 600),
+    'double_integrator': Scenario('double_integrator', CalcFDoubleIntegrator, 2, 1,
+                                  MakeDoubleIntegratorSpecs, 300,
+                                  {'is_linear': True}),
+    'quadrotor_3d': Scenario('quadrotor_3d', quadrotor3D.CalcF, quadrotor3D.n,
+                             quadrotor3D.m, MakeQuadrotor3DSpecs, 200,
+                             {'CalcFBatch': quadrotor3D.CalcFBatch}),
+}
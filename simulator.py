@@ -0,0 +1,104 @@
+import numpy as np
+
+'''
+Fixed-step closed-loop simulation in pure NumPy.
+
+This is a lightweight alternative to building a drake diagram
+(plant + controller LeafSystem + SignalLoggers) just to close a loop.
+The plant is any CalcF(x_u) -> xdot, the controller is any callable
+u = controller(x, t), and the control input is held constant
+(zero-order hold) between controller updates, which is what the
+periodic discrete update of the drake controllers does.
+'''
+
+
+def EulerStep(CalcF, x, u, h):
+    return x + h*np.asarray(CalcF(np.hstack((x, u))), dtype=float)
+
+
+# classic 4th order Runge-Kutta, u is held constant over the step.
+def Rk4Step(CalcF, x, u, h):
+    def f(xi):
+        return np.asarray(CalcF(np.hstack((xi, u))), dtype=float)
+    k1 = f(x)
+    k2 = f(x + 0.5*h*k1)
+    k3 = f(x + 0.5*h*k2)
+    k4 = f(x + h*k3)
+    return x + h/6.*(k1 + 2*k2 + 2*k3 + k4)
+
+
+integrators = {'euler': EulerStep, 'rk4': Rk4Step}
+
+
+class SimulationLog:
+    '''
+    Preallocated storage for a closed-loop simulation with N steps.
+    data() and sample_times() follow drake's SignalLogger, so
+    logger.data().T can be passed to PlotTraj and PlotTrajectoryMeshcat
+    as before.
+    '''
+    def __init__(self, n, m, N):
+        self.t = np.zeros(N+1)
+        self.x = np.zeros((N+1, n))
+        self.u = np.zeros((N+1, m))
+        self.size = 0 # number of samples written so far.
+
+    def reset(self):
+        self.size = 0
+
+    def sample_times(self):
+        return self.t[0:self.size]
+
+    # shape (n, size), same as SignalLogger.data().
+    def data(self):
+        return self.x[0:self.size].T
+
+    def input_data(self):
+        return self.u[0:self.size].T
+
+
+'''
+Simulates x_dot = CalcF(x, u) from x0 for t_final seconds with a fixed
+step h. The controller is called every control_period seconds (every
+step if control_period is None), starting at t = 0, and its output is
+held in between.
+log: a SimulationLog with at least int(round(t_final/h))+1 samples. A new
+    one is allocated if None. Pass the same log to repeated simulations to
+    avoid reallocating it.
+Returns the log.
+'''
+def Simulate(CalcF, controller, x0, t_final, h, control_period=None,
+             integrator='euler', log=None, t0=0.):
+    Step = integrators[integrator]
+    x0 = np.asarray(x0, dtype=float)
+    N = int(round(t_final/h))
+
+    if control_period is None:
+        steps_per_update = 1
+    else:
+        steps_per_update = int(round(control_period/h))
+        assert steps_per_update >= 1
+        assert abs(steps_per_update*h - control_period) < 1e-9*control_period
+
+    x = x0.copy()
+    u = np.asarray(controller(x, t0), dtype=float)
+    if log is None:
+        log = SimulationLog(x0.size, u.size, N)
+    assert log.x.shape[0] >= N+1
+    log.reset()
+
+    log.t[0] = t0
+    log.x[0] = x
+    log.u[0] = u
+    for i in range(N):
+        t = t0 + i*h
+        if i > 0 and i % steps_per_update == 0:
+            u = np.asarray(controller(x, t), dtype=float)
+            log.u[i] = u
+        x = Step(CalcF, x, u, h)
+        log.t[i+1] = t + h
+        log.x[i+1] = x
+        log.u[i+1] = u
+    log.size = N+1
+
+    return log
@@ -0,0 +1,95 @@
+import logging
+import threading
+from collections import deque, namedtuple
+
+'''
+Iteration reporting of DiscreteTimeIterativeLQR.CalcTrajectory without
+console I/O in the solver loop.
+
+After the initial guess and after every iteration, the solver builds an
+IterationRecord and passes it to every callback given to the planner
+(DiscreteTimeIterativeLQR(..., callbacks=[...])) or to the call
+(CalcTrajectory(..., callback=...)). The record is also logged at DEBUG
+level on the 'ilqr' logger, which has no output unless the application
+configures logging (or calls EnableLogging), and is only formatted if that
+level is enabled.
+
+IterationRecorder is a callback that keeps the last records of all solves
+in a ring buffer, to be dumped on demand, e.g. after a failed MPC step.
+'''
+
+logger = logging.getLogger('ilqr')
+logger.addHandler(logging.NullHandler())
+
+'''
+solve_id: id of the solve (SolveContext.solve_id), to tell concurrent
+    solves apart.
+iteration: number of completed iterations, 0 for the initial guess.
+cost: J after the iteration.
+line_search_trials: rollouts of the iteration's line search (0 for the
+    initial guess).
+max_defect: max |defect| of multiple shooting, 0 for single shooting.
+regularization: mu of ddp mode, None otherwise.
+time: wall time since the start of the solve (s).
+'''
+IterationRecord = namedtuple(
+    'IterationRecord', ['solve_id', 'iteration', 'cost', 'line_search_trials',
+                        'max_defect', 'regularization', 'time'])
+
+
+def FormatRecord(record):
+    s = "solve %d, iteration %d, line search trials %d, J: %.10g" % (
+        record.solve_id, record.iteration, record.line_search_trials, record.cost)
+    if record.max_defect > 0:
+        s += ", max defect: %.3g" % record.max_defect
+    if not(record.regularization is None):
+        s += ", mu: %.3g" % record.regularization
+    return s
+
+
+# calls all callbacks with record and logs it at DEBUG level.
+def ReportIteration(callbacks, record):
+    for callback in callbacks:
+        callback(record)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(FormatRecord(record))
+
+
+# prints the solver log to the console (or a logging.Handler) from now on.
+def EnableLogging(level=logging.DEBUG, handler=None):
+    if handler is None:
+        handler = logging.StreamHandler()
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return handler
+
+
+class IterationRecorder:
+    # capacity: number of most recent records kept.
+    def __init__(self, capacity=1000):
+        self.records = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def Clear(self):
+        with self.lock:
+            self.records.clear()
+
+    # recorded IterationRecords, oldest first, optionally of one solve only.
+    def GetRecords(self, solve_id=None):
+        with self.lock:
+            records = list(self.records)
+        if solve_id is None:
+            return records
+        return [record for record in records if record.solve_id == solve_id]
+
+    # writes the records as lines to file (e.g. sys.stdout) or returns them.
+    def Dump(self, file=None, solve_id=None):
+        lines = [FormatRecord(record) for record in self.GetRecords(solve_id)]
+        if file is None:
+            return "\n".join(lines)
+        for line in lines:
+            file.write(line + "\n")
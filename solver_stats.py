@@ -0,0 +1,102 @@
+import time
+from contextlib import contextmanager
+import numpy as np
+
+'''
+Per-solve telemetry of DiscreteTimeIterativeLQR.CalcTrajectory, collected
+without a profiler, e.g.
+    x, u, J, QN, Vx, Vxx, k, K, stats = planner.CalcTrajectory(
+        traj_specs, is_returning_stats=True)
+Phases timed (wall time, one entry per occurrence):
+    'lqr_init': terminal cost (LQR about the goal) and the initial guess,
+    'cost_derivatives', 'dynamics_derivatives', 'backward_pass',
+    'rollout': every forward rollout, including line-search trials,
+    'cost_evaluation'.
+num_dynamics_evaluations counts the steps F(x[i], u[i]) of all rollouts
+and the evaluations of F for the dynamics Hessians of ddp mode,
+num_jacobian_evaluations the steps at which fx, fu were computed (not
+reused by a JacobianCache).
+SummarizeStats combines the stats of many solves.
+'''
+
+
+class SolverStats:
+    def __init__(self):
+        self.phase_times = {} # phase: list of wall times (s)
+        self.num_dynamics_evaluations = 0
+        self.num_jacobian_evaluations = 0
+        self.line_search_trials = [] # rollouts of every iteration
+        self.regularization = [] # mu of every iteration, ddp mode only
+        self.cost_history = np.zeros(0) # J of CalcTrajectory
+        self.num_iterations = 0
+        self.total_time = 0.
+        self.max_defect = 0. # max |defect| of the result, multiple shooting only
+
+    @contextmanager
+    def Time(self, phase):
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times.setdefault(phase, []).append(
+                time.perf_counter() - t_start)
+
+    def CalcPhaseTotals(self):
+        return {phase: sum(times) for phase, times in self.phase_times.items()}
+
+    # plain Python types, e.g. for json.dump.
+    def AsDict(self):
+        return {'total_time': self.total_time,
+                'phase_totals': self.CalcPhaseTotals(),
+                'phase_counts': {phase: len(times) for phase, times in
+                                 self.phase_times.items()},
+                'num_iterations': self.num_iterations,
+                'num_dynamics_evaluations': self.num_dynamics_evaluations,
+                'num_jacobian_evaluations': self.num_jacobian_evaluations,
+                'line_search_trials': [int(c) for c in self.line_search_trials],
+                'regularization': [float(mu) for mu in self.regularization],
+                'cost_history': np.asarray(self.cost_history, dtype=float).tolist(),
+                'max_defect': float(self.max_defect)}
+
+
+'''
+Summary of a list of SolverStats: number of solves, mean and max total
+time, total and mean (per solve) time of every phase and its share of the
+total time, and mean iterations, evaluations and line-search trials.
+'''
+def SummarizeStats(stats_list):
+    stats_list = list(stats_list)
+    num_solves = len(stats_list)
+    total_times = np.array([stats.total_time for stats in stats_list])
+    total_time = total_times.sum()
+    phases = {}
+    for stats in stats_list:
+        for phase, t in stats.CalcPhaseTotals().items():
+            phases[phase] = phases.get(phase, 0.) + t
+    return {'num_solves': num_solves,
+            'mean_time': total_times.mean() if num_solves > 0 else 0.,
+            'max_time': total_times.max() if num_solves > 0 else 0.,
+            'phases': {phase: {'total': t,
+                               'mean': t/num_solves,
+                               'fraction': t/total_time if total_time > 0 else 0.}
+                       for phase, t in phases.items()},
+            'mean_iterations': np.mean([stats.num_iterations for stats in stats_list]),
+            'mean_dynamics_evaluations':
+                np.mean([stats.num_dynamics_evaluations for stats in stats_list]),
+            'mean_jacobian_evaluations':
+                np.mean([stats.num_jacobian_evaluations for stats in stats_list]),
+            'mean_line_search_trials':
+                np.mean([sum(stats.line_search_trials) for stats in stats_list])}
+
+
+# table of the phases of a summary, most expensive first.
+def FormatSummary(summary):
+    lines = ["%d solves, mean %.2f ms, max %.2f ms, %.1f iterations" %
+             (summary['num_solves'], 1e3*summary['mean_time'],
+              1e3*summary['max_time'], summary['mean_iterations']),
+             "%22s %12s %8s" % ("phase", "mean(ms)", "share")]
+    phases = sorted(summary['phases'].items(), key=lambda item: -item[1]['total'])
+    for phase, values in phases:
+        lines.append("%22s %12.3f %7.1f%%" %
+                     (phase, 1e3*values['mean'], 100*values['fraction']))
+    return "\n".join(lines)
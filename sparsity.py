@@ -0,0 +1,87 @@
+import numpy as np
+from pydrake.forwarddiff import jacobian
+
+'''
+Known structure of the Jacobian [A, B] = d CalcF/d(x, u) of a model.
+
+A model declares the rows (state derivatives) and columns (states and
+inputs) whose entries depend on (x, u); every entry outside this block is
+constant and taken from f_x_u_const. For the 3D quadrotor, xdot[0:6] =
+x[6:12] is linear and positions and linear velocities enter the dynamics
+only through these rows, so only the (6, 10) block of rows 6:12 and columns
+rpy, rpy_d, u is differentiated instead of the full (12, 16) Jacobian.
+
+From the same pattern, the nonzero rows of fu and the columns of [fx, fu]
+that stay constant after an explicit Runge-Kutta discretization follow
+(see CalcDiscretePattern). These let the derivative providers skip the
+constant columns, and the backward pass restrict its products with fu to
+the nonzero rows.
+'''
+
+
+class JacobianStructure:
+    # varying_rows, varying_cols: indices of the rows and columns of the
+    #   (n, n+m) Jacobian whose entries depend on (x, u).
+    # f_x_u_const: (n, n+m) Jacobian with the constant entries; entries in
+    #   the varying block are ignored.
+    def __init__(self, n, m, varying_rows, varying_cols, f_x_u_const):
+        self.n = n
+        self.m = m
+        self.varying_rows = np.asarray(varying_rows)
+        self.varying_cols = np.asarray(varying_cols)
+        self.f_x_u_const = np.array(f_x_u_const, dtype=float)
+        self.f_x_u_const[np.ix_(self.varying_rows, self.varying_cols)] = 0.
+
+    '''
+    Drop-in replacement for pydrake.forwarddiff.jacobian(CalcF, x_u) that
+    differentiates only the varying block, e.g. as the CalcJacobian
+    argument of ExplicitRungeKutta.CalcJacobians.
+    '''
+    def CalcJacobian(self, CalcF, x_u):
+        def CalcFVarying(z):
+            x_u_z = np.array(x_u, dtype=object)
+            x_u_z[self.varying_cols] = z
+            return CalcF(x_u_z)[self.varying_rows]
+
+        f_x_u = self.f_x_u_const.copy()
+        f_x_u[np.ix_(self.varying_rows, self.varying_cols)] = \
+            jacobian(CalcFVarying, x_u[self.varying_cols])
+        return f_x_u
+
+    '''
+    Sparsity of the discrete Jacobian [fx, fu] of an explicit Runge-Kutta
+    method with num_stages stages. Every stage can propagate a perturbation
+    one step further along the nonzero pattern P of the state columns of
+    [A, B], so the pattern of [fx, fu] is contained in
+        [I, 0] | P | P_x*P | ... | P_x^(num_stages-1)*P.
+    A column is constant if the states it reaches through the constant
+    entries never include a varying column.
+    Returns fu_rows, the rows of fu that can be nonzero (a slice if they
+    are contiguous), and is_constant_col (n+m,) of [fx, fu].
+    '''
+    def CalcDiscretePattern(self, num_stages):
+        n = self.n
+        P = self.f_x_u_const != 0
+        P[np.ix_(self.varying_rows, self.varying_cols)] = True
+        pattern = P.copy()
+        P_k = P.copy()
+        for s in range(1, num_stages):
+            P_k = P[:, 0:n].astype(int).dot(P_k.astype(int)) > 0
+            pattern |= P_k
+        rows = np.nonzero(pattern[:, n:].any(axis=1))[0]
+        if rows.size > 0 and rows[-1] - rows[0] + 1 == rows.size:
+            fu_rows = slice(rows[0], rows[-1] + 1)
+        else:
+            fu_rows = rows
+
+        is_varying = np.zeros(n + self.m, dtype=bool)
+        is_varying[self.varying_cols] = True
+        C_x = (self.f_x_u_const[:, 0:n] != 0).astype(int)
+        is_constant_col = np.zeros(n + self.m, dtype=bool)
+        for j in range(n + self.m):
+            reached = self.f_x_u_const[:, j] != 0
+            for s in range(n):
+                reached = reached | (C_x.dot(reached.astype(int)) > 0)
+            is_constant_col[j] = not(is_varying[j]) and \
+                not(is_varying[0:n][reached].any())
+        return fu_rows, is_constant_col
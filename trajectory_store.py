@@ -0,0 +1,267 @@
+import json
+import os
+import numpy as np
+
+'''
+Append-only binary store of solutions and simulation logs, read back
+lazily through np.memmap.
+
+A store is a directory of records, e.g. one record per MPC solve with the
+fields x (N+1, n), u (N, m), k (N, m), K (N, m, n), Vx (N+1, n),
+Vxx (N+1, n, n) and t0 (), or one per simulation with t (T,), x (T, n) and
+u (T, m). All records of a store have the same fields. A field's records
+may differ in length (the first axis), but must agree in the remaining
+axes (its row shape) and dtype.
+
+Layout of the directory:
+    index.json: {"version": 1,
+                 "fields": {name: {"dtype": numpy dtype string, e.g. "<f8",
+                                   "row_shape": [...],
+                                   "scalar": bool,
+                                   "file": file name stem}, ...}}
+    <stem>.bin: the rows of all records of the field, concatenated in
+        record order, C order, no header. A field is scalar if its first
+        record has no axes (e.g. t0); its records are then stored as one
+        row each and read back without the first axis. Records of all
+        other fields are read back with their first axis, whatever their
+        length (0 and 1 included). Stores written before "scalar" was
+        recorded treat fields with one row per record as scalar.
+    <stem>.idx: int64 (little-endian), the end row of every record in
+        <stem>.bin; record i spans rows [idx[i-1], idx[i]) (idx[-1] = 0).
+The stems are the field names prefixed with their position ("04_Vx"), so
+fields such as k and K have distinct files on case-insensitive file
+systems.
+A record is written field by field, data before index, so a store cut off
+mid-write (e.g. a crashed MPC run) reads back as its complete records:
+the number of records is the shortest .idx.
+
+GetField(name) maps a field of all records without reading it, as an
+array (num_records, L, ...) if all records have length L, and GetRecord(i)
+returns views of one record, so slices of millions of solves can be
+replayed or analyzed without loading the store.
+'''
+
+store_version = 1
+
+
+class TrajectoryStore:
+    # mode: 'r' to read the records present when opened, 'a' to append
+    #   (creating the store if needed, and dropping a partly written last
+    #   record).
+    # dtype: with mode 'a', floating-point fields of a new store are stored
+    #   with this dtype (e.g. np.float32 to halve the size); None keeps the
+    #   dtypes of the first record.
+    def __init__(self, directory, mode='r', dtype=None):
+        assert mode in ('r', 'a')
+        self.directory = directory
+        self.mode = mode
+        self.dtype = dtype
+        self.fields = None
+        self.stems = {}
+        self.scalar_fields = {} # None for stores that did not record it.
+        self.num_records = 0
+        self.row_ends = {} # rows of every field in the store.
+        self.files = {}
+        self.ends = {}
+        self.maps = {}
+        index_path = os.path.join(directory, 'index.json')
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if index['version'] != store_version:
+                raise ValueError("%s: unsupported store version %s" % (
+                    directory, index['version']))
+            self.fields = {name: (np.dtype(field['dtype']), tuple(field['row_shape']))
+                           for name, field in index['fields'].items()}
+            self.stems = {name: field['file'] for name, field in index['fields'].items()}
+            self.scalar_fields = {name: field.get('scalar')
+                                  for name, field in index['fields'].items()}
+            self.num_records = min(self.CalcFileSize(name, '.idx') // 8
+                                   for name in self.fields)
+            for name in self.fields:
+                ends = self.CalcRecordEnds(name)
+                self.row_ends[name] = int(ends[-1]) if self.num_records > 0 else 0
+            if mode == 'a':
+                self.Truncate()
+        elif mode == 'r':
+            raise IOError("%s is not a trajectory store" % directory)
+        elif not(os.path.isdir(directory)):
+            os.makedirs(directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def __len__(self):
+        return self.num_records
+
+    def __getitem__(self, i):
+        return self.GetRecord(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.GetRecord(i)
+
+    def Close(self):
+        for data_file, idx_file in self.files.values():
+            data_file.close()
+            idx_file.close()
+        self.files = {}
+        self.ends = {}
+        self.maps = {}
+
+    def GetPath(self, name, extension):
+        return os.path.join(self.directory, self.stems[name] + extension)
+
+    def CalcFileSize(self, name, extension):
+        path = self.GetPath(name, extension)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    # drops the rows and index entries beyond the complete records.
+    def Truncate(self):
+        self.ends = {}
+        self.maps = {}
+        for name, (dtype, row_shape) in self.fields.items():
+            row_bytes = dtype.itemsize*int(np.prod(row_shape))
+            for extension, size in (('.idx', 8*self.num_records),
+                                    ('.bin', row_bytes*self.row_ends[name])):
+                if self.CalcFileSize(name, extension) > size:
+                    with open(self.GetPath(name, extension), 'r+b') as f:
+                        f.truncate(size)
+
+    def CreateFields(self, arrays):
+        self.fields = {}
+        for j, (name, value) in enumerate(arrays.items()):
+            self.stems[name] = "%02d_%s" % (j, name)
+            dtype = value.dtype
+            if not(self.dtype is None) and np.issubdtype(dtype, np.floating):
+                dtype = np.dtype(self.dtype)
+            row_shape = value.shape[1:] if value.ndim > 0 else ()
+            self.fields[name] = (dtype.newbyteorder('<'), row_shape)
+            self.scalar_fields[name] = value.ndim == 0
+            self.row_ends[name] = 0
+        index = {'version': store_version,
+                 'fields': {name: {'dtype': dtype.str, 'row_shape': list(row_shape),
+                                   'scalar': self.scalar_fields[name],
+                                   'file': self.stems[name]}
+                            for name, (dtype, row_shape) in self.fields.items()}}
+        with open(os.path.join(self.directory, 'index.json'), 'w') as f:
+            json.dump(index, f, indent=1)
+
+    '''
+    Appends one record, e.g. Append(x=x, u=u, t0=t0), with the fields of
+    the store (the first record defines them). Returns its index.
+    '''
+    def Append(self, **arrays):
+        assert self.mode == 'a'
+        arrays = {name: np.asarray(value) for name, value in arrays.items()}
+        if self.fields is None:
+            self.CreateFields(arrays)
+        if set(arrays) != set(self.fields):
+            raise ValueError("record fields %s differ from the store's %s" % (
+                sorted(arrays), sorted(self.fields)))
+        records = {}
+        for name, value in arrays.items():
+            dtype, row_shape = self.fields[name]
+            if self.IsScalarField(name):
+                if value.shape != row_shape:
+                    raise ValueError("field %s has shape %s, expected %s" % (
+                        name, value.shape, row_shape))
+                records[name] = value[np.newaxis]
+            elif value.shape[1:] == row_shape and value.ndim == len(row_shape) + 1:
+                records[name] = value
+            else:
+                raise ValueError("field %s has shape %s, expected (L,) + %s" % (
+                    name, value.shape, row_shape))
+        for name, rows in records.items():
+            dtype, row_shape = self.fields[name]
+            data_file, idx_file = self.OpenFiles(name)
+            data_file.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+            data_file.flush()
+            self.row_ends[name] += rows.shape[0]
+            idx_file.write(np.array([self.row_ends[name]], dtype='<i8').tobytes())
+            idx_file.flush()
+        self.num_records += 1
+        return self.num_records - 1
+
+    # appends the solution of DiscreteTimeIterativeLQR.CalcTrajectory, whose
+    # x and u are the final iteration's, started at t0.
+    def AppendSolution(self, x, u, k, K, Vx, Vxx, t0=0.):
+        return self.Append(x=x, u=u, k=k, K=K, Vx=Vx, Vxx=Vxx, t0=t0)
+
+    # appends the log of a drake SignalLogger or simulator.SimulationLog of
+    # the states (and optionally of the inputs) as fields t, x (and u).
+    def AppendSignalLog(self, logger_x, logger_u=None):
+        arrays = {'t': logger_x.sample_times(), 'x': logger_x.data().T}
+        if not(logger_u is None):
+            arrays['u'] = logger_u.data().T
+        return self.Append(**arrays)
+
+    def OpenFiles(self, name):
+        if not(name in self.files):
+            self.files[name] = (open(self.GetPath(name, '.bin'), 'ab'),
+                                open(self.GetPath(name, '.idx'), 'ab'))
+        return self.files[name]
+
+    # end rows of the records of a field, a read-only memmap.
+    def CalcRecordEnds(self, name):
+        if self.num_records == 0:
+            return np.zeros(0, dtype='<i8')
+        if not(name in self.ends) or self.ends[name].shape[0] < self.num_records:
+            self.ends[name] = np.memmap(self.GetPath(name, '.idx'), dtype='<i8',
+                                        mode='r', shape=(self.num_records,))
+        return self.ends[name][0:self.num_records]
+
+    # all rows of a field's records, a read-only memmap (rows,) + row_shape.
+    def MapRows(self, name):
+        dtype, row_shape = self.fields[name]
+        num_rows = self.row_ends[name]
+        if num_rows == 0:
+            return np.zeros((0,) + row_shape, dtype=dtype)
+        if not(name in self.maps) or self.maps[name].shape[0] < num_rows:
+            self.maps[name] = np.memmap(self.GetPath(name, '.bin'), dtype=dtype,
+                                        mode='r', shape=(num_rows,) + row_shape)
+        return self.maps[name][0:num_rows]
+
+    # whether the field's records have no first axis, e.g. t0.
+    def IsScalarField(self, name):
+        if self.scalar_fields[name] is None:
+            return self.row_ends[name] == self.num_records
+        return self.scalar_fields[name]
+
+    # views of the fields of record i; scalar fields (e.g. t0) are returned
+    # without the first axis.
+    def GetRecord(self, i):
+        if i < 0:
+            i += self.num_records
+        if not(0 <= i < self.num_records):
+            raise IndexError("record %d of a store with %d records" % (
+                i, self.num_records))
+        record = {}
+        for name in self.fields:
+            ends = self.CalcRecordEnds(name)
+            start = ends[i-1] if i > 0 else 0
+            record[name] = self.MapRows(name)[start:ends[i]]
+            if self.IsScalarField(name):
+                record[name] = record[name][0]
+        return record
+
+    '''
+    A field of all records as a read-only memmap: (num_records,) +
+    row_shape for a scalar field, (num_records, L) + row_shape if all
+    records have length L, otherwise the concatenated rows (use GetRecord
+    for those records).
+    '''
+    def GetField(self, name):
+        rows = self.MapRows(name)
+        num_rows = rows.shape[0]
+        if self.num_records == 0 or self.IsScalarField(name) or \
+                num_rows % self.num_records != 0:
+            return rows
+        L = num_rows // self.num_records
+        if not(np.array_equal(self.CalcRecordEnds(name),
+                              L*np.arange(1, self.num_records + 1))):
+            return rows
+        return rows.reshape((self.num_records, L) + rows.shape[1:])
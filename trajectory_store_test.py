@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+import numpy as np
+from trajectory_store import TrajectoryStore
+
+'''
+Round trips of trajectory_store.TrajectoryStore for records of length 0
+and 1 and of varying length, e.g.
+    python trajectory_store_test.py
+'''
+
+
+def test_short_and_variable_length_records():
+    directory = tempfile.mkdtemp()
+    try:
+        # x: lengths 1, 0, 2, 1 with row shape (3,); t0: scalar.
+        records = [{'x': np.arange(3.).reshape(1, 3), 't0': 0.},
+                   {'x': np.zeros((0, 3)), 't0': 0.1},
+                   {'x': np.arange(6.).reshape(2, 3), 't0': 0.2},
+                   {'x': -np.ones((1, 3)), 't0': 0.3}]
+        with TrajectoryStore(directory, 'a') as store:
+            for record in records:
+                store.Append(**record)
+
+        with TrajectoryStore(directory) as store:
+            assert len(store) == len(records)
+            for i, record in enumerate(records):
+                stored = store.GetRecord(i)
+                assert stored['x'].shape == record['x'].shape
+                assert np.array_equal(stored['x'], record['x'])
+                assert stored['t0'].shape == ()
+                assert stored['t0'] == record['t0']
+            assert store.GetField('t0').shape == (len(records),)
+            assert store.GetField('x').shape == (4, 3) # concatenated rows.
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_length_one_records():
+    directory = tempfile.mkdtemp()
+    try:
+        with TrajectoryStore(directory, 'a') as store:
+            for i in range(3):
+                store.Append(x=np.full((1, 3), i), t=np.array([0.1*i]))
+
+        # reopened, so that nothing is left from the appends.
+        with TrajectoryStore(directory) as store:
+            assert store.GetRecord(1)['x'].shape == (1, 3)
+            assert store.GetRecord(1)['t'].shape == (1,)
+            assert store.GetField('x').shape == (3, 1, 3)
+            assert np.array_equal(store.GetField('t'), [[0.], [0.1], [0.2]])
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_empty_records():
+    directory = tempfile.mkdtemp()
+    try:
+        with TrajectoryStore(directory, 'a') as store:
+            store.Append(x=np.zeros((0, 2)))
+            store.Append(x=np.zeros((0, 2)))
+        with TrajectoryStore(directory) as store:
+            assert store.GetRecord(0)['x'].shape == (0, 2)
+            assert store.GetField('x').shape == (2, 0, 2)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    test_short_and_variable_length_records()
+    test_length_one_records()
+    test_empty_records()
+    print("trajectory_store: all tests passed")